@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import io
+import os
+
+from collections import OrderedDict
+from typing import TYPE_CHECKING
+from PIL import Image
+
+if TYPE_CHECKING:
+    from http_client import HttpClient
+
+
+THUMBNAIL_SIZE = (128, 128)  # plenty for a 10 color palette
+
+
+class AlbumArtCache:
+    # downscaled album covers on disk, keyed by album id since spotify reuses the cover for every track of an album
+    def __init__(self, directory: str, max_bytes: int, http: HttpClient):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.http = http
+
+        os.makedirs(directory, exist_ok=True)
+
+        self.entries: OrderedDict[str, int] = OrderedDict()  # file name -> size, least recently used first
+        files = []
+        for entry in os.scandir(directory):
+            if not entry.is_file():
+                continue
+
+            if entry.name.endswith(".part"):  # killed while saving it, see `get`
+                os.remove(entry.path)
+            else:
+                files.append(entry)
+
+        for entry in sorted(files, key=lambda e: e.stat().st_mtime):
+            self.entries[entry.name] = entry.stat().st_size
+
+        self.total_bytes = sum(self.entries.values())
+
+        self.hits = 0
+        self.misses = 0
+
+    def _file_name(self, key: str) -> str:
+        return "".join(c if c.isalnum() else "_" for c in key) + ".jpg"
+
+    def get(self, key: str, url: str) -> str | None:
+        name = self._file_name(key)
+        path = os.path.join(self.directory, name)
+
+        if name in self.entries and os.path.exists(path):
+            try:
+                with Image.open(path) as image:
+                    image.load()  # a thumbnail, cheap. Only read when the palette isn't in the database anyway
+            except OSError as error:  # broken somehow, download it again
+                print("Dropping a broken album art file:", error)
+                self.total_bytes -= self.entries.pop(name)
+                os.remove(path)
+            else:
+                self.entries.move_to_end(name)
+                os.utime(path)  # so the LRU order survives restarts
+                self.hits += 1
+                return path
+
+        self.misses += 1
+        response = self.http.get("album art", url)
+        if response is None:
+            return None
+
+        if response.status_code != 200:
+            print("Failed to download the album art", response.status_code)
+            return None
+
+        image = Image.open(io.BytesIO(response.content)).convert("RGB")
+        image.thumbnail(THUMBNAIL_SIZE)
+        image.save(path + ".part", "JPEG", quality=90)
+        os.replace(path + ".part", path)  # never leaves a half written file under the real name
+
+        self.entries[name] = os.path.getsize(path)
+        self.entries.move_to_end(name)
+        self.total_bytes = sum(self.entries.values())
+        self._evict()
+
+        return path
+
+    def _evict(self):
+        while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+            name, size = self.entries.popitem(last=False)
+            self.total_bytes -= size
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,75 @@
+# Compares palette.extract_palette against Pylette's KMeans on a folder of album covers
+# usage: python benchmarks/palette_benchmark.py <folder with images> [runs]
+# Pylette isn't in requirements.txt anymore, run `pip install pylette==4.1.0` first to compare against it
+from __future__ import annotations
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from PIL import Image
+from palette import extract_palette
+
+
+def quantization_error(image: Image.Image, palette: list[tuple[int, int, int]]) -> float:
+    # mean distance from every pixel to its closest palette color, lower is better
+    pixels = np.asarray(image.convert("RGB").resize((64, 64), Image.Resampling.NEAREST), dtype=np.float64).reshape(-1, 1, 3)
+    colors = np.asarray(palette, dtype=np.float64).reshape(1, -1, 3)
+    return float(np.sqrt(((pixels - colors) ** 2).sum(axis=2)).min(axis=1).mean())
+
+
+def bench(func, runs: int) -> tuple[float, list]:
+    result = func()
+    start = time.perf_counter()
+    for _ in range(runs):
+        result = func()
+
+    return (time.perf_counter() - start) / runs * 1000, result
+
+
+def main():
+    folder = sys.argv[1]
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    try:
+        from Pylette import extract_colors
+    except ImportError:
+        extract_colors = None
+        print("Pylette isn't installed (pip install pylette==4.1.0), only timing the built-in extractor")
+
+    totals = {"median cut": [0.0, 0.0], "pylette": [0.0, 0.0]}
+    paths = [os.path.join(folder, name) for name in sorted(os.listdir(folder)) if name.lower().endswith((".jpg", ".jpeg", ".png"))]
+    for path in paths:
+        image = Image.open(path)
+        image.load()
+
+        ms, palette = bench(lambda: extract_palette(image.copy(), palette_size=10), runs)
+        error = quantization_error(image, palette)
+        totals["median cut"][0] += ms
+        totals["median cut"][1] += error
+        line = f"{os.path.basename(path)}: median cut {ms:.2f}ms (error {error:.1f})"
+
+        if extract_colors is not None:
+            ms, result = bench(lambda: extract_colors(path, palette_size=10), runs)
+            error = quantization_error(image, [tuple(color.rgb) for color in result.colors])
+            totals["pylette"][0] += ms
+            totals["pylette"][1] += error
+            line += f", pylette {ms:.2f}ms (error {error:.1f})"
+
+        print(line)
+
+    if not paths:
+        print("No images found")
+        return
+
+    for name, (ms, error) in totals.items():
+        if ms:
+            print(f"{name}: {ms / len(paths):.2f}ms average, {error / len(paths):.1f} average error")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,451 @@
+# Replays a scripted listening session against local stand-ins for spotify, lrclib and the album art CDN,
+# with the real app running headless, and reports how quickly lyrics showed up and what it cost
+# usage: python benchmarks/replay_benchmark.py [--latency 0.05] [--lrclib-latency 0.3] [--failure-rate 0.05] [--mpris] [--json report.json]
+from __future__ import annotations
+
+import io
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import subprocess
+import threading
+import statistics
+
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+# (seconds into the session, action, *arguments)
+SESSION = [
+    (0.0, "play", "track1", 0),
+    (8.0, "seek", 150_000),
+    (12.0, "pause"),
+    (18.0, "resume"),
+    (22.0, "rate limit", 2),  # the next 2 polls get a 429
+    (28.0, "play", "track2", 0),
+    (36.0, "play", "instrumental", 0),
+    (42.0, "play", "missing", 0),
+    (48.0, "play", "track1", 60_000),  # saved by now, so this one comes from the local database
+    (56.0, "stop"),
+    (62.0, "end"),
+]
+
+# id -> (title, artist, album, duration in ms, what lrclib has: "synced", "instrumental" or "missing")
+TRACKS = {
+    "track1": ("Replay Song", "Bench Artist", "Album One", 200_000, "synced"),
+    "track2": ("Another Replay", "Bench Artist, Guest", "Album Two", 185_000, "synced"),
+    "instrumental": ("Interlude", "Bench Artist", "Album One", 90_000, "instrumental"),
+    "missing": ("Unreleased", "Nobody", "Album Three", 150_000, "missing"),
+}
+
+
+def fake_lyrics(duration_ms: int) -> str:
+    lines = []
+    for start in range(2_000, duration_ms, 4_000):
+        minutes, seconds = divmod(start // 1000, 60)
+        words = " ".join(f"<{minutes:02}:{seconds:02}.{i * 25:02}>word{i}" for i in range(4))
+        lines.append(f"[{minutes:02}:{seconds:02}.00] {words}")
+
+    return "\n".join(lines)
+
+
+class FakeServices:
+    # the state of the fake spotify player and the settings shared by every request handler
+    def __init__(self, latency: float, lrclib_latency: float, failure_rate: float):
+        self.latency = latency
+        self.lrclib_latency = lrclib_latency
+        self.failure_rate = failure_rate
+
+        self.track: str | None = None
+        self.playing = False
+        self.position_ms = 0  # at `anchor`
+        self.anchor = time.monotonic()
+        self.rate_limited = 0  # polls left that get a 429
+
+        self.requests: dict[str, int] = {}
+        self.art: dict[str, bytes] = {}
+        self._lock = threading.Lock()
+        self.base_url = ""
+
+    def progress(self) -> int:
+        if not self.playing:
+            return self.position_ms
+        return self.position_ms + int((time.monotonic() - self.anchor) * 1000)
+
+    def apply(self, action: str, *args):
+        with self._lock:
+            now = time.monotonic()
+            if action == "play":
+                self.track, self.position_ms = args
+                self.playing = True
+            elif action == "seek":
+                self.position_ms = args[0]
+            elif action == "pause":
+                self.position_ms = self.progress()
+                self.playing = False
+            elif action == "resume":
+                self.playing = True
+            elif action == "rate limit":
+                self.rate_limited = args[0]
+            elif action == "stop":
+                self.track = None
+                self.playing = False
+
+            self.anchor = now
+
+    def count(self, route: str):
+        with self._lock:
+            self.requests[route] = self.requests.get(route, 0) + 1
+
+    def currently_playing(self) -> tuple[int, dict | None, dict]:
+        with self._lock:
+            if self.rate_limited:
+                self.rate_limited -= 1
+                return 429, None, {"Retry-After": "1"}
+
+            if self.track is None:
+                return 204, None, {}
+
+        title, artist, album, duration, _ = TRACKS[self.track]
+        album_id = album.lower().replace(" ", "")
+        return 200, {
+            "is_playing": self.playing,
+            "progress_ms": min(self.progress(), duration),
+            "item": {
+                "id": self.track,
+                "name": title,
+                "duration_ms": duration,
+                "artists": [{"name": name} for name in artist.split(", ")],
+                "album": {"id": album_id, "name": album, "images": [{"url": f"{self.base_url}/art/{album_id}.jpg"}]}
+            }
+        }, {}
+
+    def find_track(self, title: str) -> tuple | None:
+        for track in TRACKS.values():
+            if track[0] == title:
+                return track
+        return None
+
+    def album_art(self, album_id: str) -> bytes:
+        from PIL import Image
+
+        with self._lock:
+            if album_id not in self.art:
+                rng = random.Random(album_id)
+                image = Image.new("RGB", (300, 300))
+                for x in range(0, 300, 50):
+                    for y in range(0, 300, 50):
+                        image.paste((rng.randrange(256), rng.randrange(256), rng.randrange(256)), (x, y, x + 50, y + 50))
+
+                buffer = io.BytesIO()
+                image.save(buffer, "JPEG")
+                self.art[album_id] = buffer.getvalue()
+
+            return self.art[album_id]
+
+
+class MockMprisPlayer:
+    # the desktop client's MPRIS interface for `--mpris`, serving the same player state on a private bus
+    name = "org.mpris.MediaPlayer2.spotify"
+
+    def __init__(self, services: FakeServices, address: str):
+        from jeepney import message_bus
+        from jeepney.io.blocking import Proxy, open_dbus_connection
+
+        self.services = services
+        self.connection = open_dbus_connection(address)
+        self._send_lock = threading.Lock()  # replies go out from the serving thread, signals from the session one
+        Proxy(message_bus, self.connection).RequestName(self.name)
+        threading.Thread(target=self._serve, daemon=True, name="mock mpris").start()
+
+    def properties(self) -> dict[str, tuple[str, object]]:
+        services = self.services
+        if services.track is None:
+            return {"PlaybackStatus": ("s", "Stopped"), "Metadata": ("a{sv}", {}), "Position": ("x", 0)}
+
+        title, artist, album, duration, _ = TRACKS[services.track]
+        album_id = album.lower().replace(" ", "")
+        return {
+            "PlaybackStatus": ("s", "Playing" if services.playing else "Paused"),
+            "Metadata": ("a{sv}", {
+                "mpris:trackid": ("o", f"/com/spotify/track/{services.track}"),
+                "mpris:length": ("x", duration * 1000),
+                "mpris:artUrl": ("s", f"{services.base_url}/art/{album_id}.jpg"),
+                "xesam:title": ("s", title),
+                "xesam:artist": ("as", artist.split(", ")),
+                "xesam:album": ("s", album),
+            }),
+            "Position": ("x", min(services.progress(), duration) * 1000),
+        }
+
+    def _send(self, message):
+        with self._send_lock:
+            self.connection.send(message)
+
+    def _serve(self):
+        from jeepney import HeaderFields, MessageType, new_error, new_method_return
+
+        while True:
+            try:
+                message = self.connection.receive()
+            except ConnectionError:  # the bus was shut down with the benchmark
+                return
+
+            fields = message.header.fields
+            if message.header.message_type != MessageType.method_call:
+                continue
+
+            member = fields.get(HeaderFields.member)
+            self.services.count(f"mpris {member}")
+            properties = self.properties()
+            if member == "GetAll":
+                self._send(new_method_return(message, "a{sv}", (properties,)))
+            elif member == "Get" and message.body[1] in properties:
+                self._send(new_method_return(message, "v", (properties[message.body[1]],)))
+            else:
+                self._send(new_error(message, "org.freedesktop.DBus.Error.UnknownMethod"))
+
+    def changed(self, action: str):
+        from jeepney import DBusAddress, new_signal
+
+        path = "/org/mpris/MediaPlayer2"
+        if action == "seek":
+            address = DBusAddress(path, interface="org.mpris.MediaPlayer2.Player")
+            self._send(new_signal(address, "Seeked", "x", (self.services.progress() * 1000,)))
+        elif action in ("play", "pause", "resume", "stop"):
+            properties = self.properties()
+            changed = {key: properties[key] for key in ("PlaybackStatus", "Metadata")}
+            address = DBusAddress(path, interface="org.freedesktop.DBus.Properties")
+            self._send(new_signal(address, "PropertiesChanged", "sa{sv}as", ("org.mpris.MediaPlayer2.Player", changed, [])))
+
+
+def start_bus() -> tuple[subprocess.Popen, str]:
+    # a private session bus, so neither the mock player nor the app touch a real one
+    daemon = subprocess.Popen(["dbus-daemon", "--session", "--nofork", "--print-address"], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    assert daemon.stdout is not None
+    return daemon, daemon.stdout.readline().strip()
+
+
+def make_handler(services: FakeServices):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def send(self, status: int, body: bytes = b"", content_type: str = "application/json", headers: dict | None = None):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            query = {key: values[0] for key, values in parse_qs(url.query).items()}
+            route = url.path.rsplit("/", 1)[0] if url.path.startswith("/art/") else url.path
+            services.count(route)
+
+            latency = services.lrclib_latency if url.path.startswith("/api/") else services.latency
+            time.sleep(latency * random.uniform(0.5, 1.5))
+
+            if random.random() < services.failure_rate:
+                self.send(503)
+                return
+
+            if url.path == "/v1/me/player/currently-playing":
+                status, data, headers = services.currently_playing()
+                self.send(status, json.dumps(data).encode() if data is not None else b"", headers=headers)
+            elif url.path == "/api/get":
+                track = services.find_track(query.get("track_name", ""))
+                if track is None or track[4] == "missing":
+                    self.send(404, b'{"message": "Failed to find specified track"}')
+                else:
+                    synced = fake_lyrics(track[3]) if track[4] == "synced" else None
+                    self.send(200, json.dumps({"instrumental": track[4] == "instrumental", "syncedLyrics": synced}).encode())
+            elif url.path == "/api/search":
+                track = services.find_track(query.get("track_name", ""))
+                results = []
+                if track is not None and track[4] == "synced":
+                    results.append({"duration": track[3] / 1000, "syncedLyrics": fake_lyrics(track[3])})
+                self.send(200, json.dumps(results).encode())
+            elif url.path.startswith("/art/"):
+                self.send(200, services.album_art(url.path[5:-4]), "image/jpeg")
+            else:
+                self.send(404)
+
+    return Handler
+
+
+def summarize(samples: list[float]) -> dict[str, float]:
+    if not samples:
+        return {"count": 0}
+
+    samples = sorted(samples)
+    pick = lambda q: round(samples[min(len(samples) - 1, int(q * len(samples)))], 2)
+    return {"count": len(samples), "p50": pick(0.5), "p95": pick(0.95), "p99": pick(0.99), "max": round(samples[-1], 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a scripted listening session against fake spotify/lrclib servers")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds the spotify and album art stand-ins take to answer")
+    parser.add_argument("--lrclib-latency", type=float, default=0.3)
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="chance of any request getting a 503")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--mpris", action="store_true", help="follow a mock desktop client on a private D-Bus (needs dbus-daemon and jeepney)")
+    parser.add_argument("--json", help="also write the report to this file, to compare commits")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    output = os.path.abspath(args.json) if args.json else None
+    os.environ.setdefault("ARCADE_HEADLESS", "1")
+
+    services = FakeServices(args.latency, args.lrclib_latency, args.failure_rate)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(services))
+    services.base_url = f"http://127.0.0.1:{server.server_port}"
+    threading.Thread(target=server.serve_forever, daemon=True, name="fake services").start()
+
+    bus, bus_address, player = None, "SESSION", None
+    if args.mpris:
+        bus, bus_address = start_bus()
+        player = MockMprisPlayer(services, bus_address)
+
+    # the app reads config.json and writes lyrics.db in the working directory, so give it a scratch one
+    workdir = tempfile.mkdtemp(prefix="lyrics-replay-")
+    os.chdir(workdir)
+    with open("config.json", "w") as f:
+        json.dump({
+            "spotify client id": "replay",
+            "spotify client secret": "replay",
+            "save lyrics": True,
+            "playback source": "auto" if args.mpris else "spotify",  # never a real desktop client
+            "mpris bus": bus_address,
+            "album art cache dir": os.path.join(workdir, "album_art"),
+        }, f)
+
+    import arcade
+    import pyglet
+    import spotipy
+    import main as app
+
+    from lyric_views import LyricsView, LyricErrorView
+    from http_client import TIMEOUTS
+    from metrics import metrics
+    from playback_sources import SpotifyWebSource
+
+    app.load_services()
+    app.spotify = spotipy.Spotify(auth="replay", requests_session=app.http.session, requests_timeout=TIMEOUTS["spotify"])
+    app.spotify.prefix = f"{services.base_url}/v1/"
+    app.playback_sources[-1] = SpotifyWebSource(app.spotify)
+    for provider in app.lyric_resolver.providers:
+        if hasattr(provider, "base_url"):
+            provider.base_url = f"{services.base_url}/api"  # type: ignore
+
+    class ReplayWindow(app.Window):
+        def __init__(self):
+            self.frame_times: dict[str, list[float]] = {"on_update": [], "on_draw": []}
+            self.shown: list[tuple[float, str | None, str]] = []  # (when, song id, view type)
+            super().__init__()
+
+        def dispatch_event(self, event_type, *args):
+            if event_type not in self.frame_times:
+                return super().dispatch_event(event_type, *args)
+
+            start = time.perf_counter()
+            result = super().dispatch_event(event_type, *args)
+            self.frame_times[event_type].append((time.perf_counter() - start) * 1000)
+            return result
+
+        def show_view(self, view):
+            super().show_view(view)
+            if isinstance(view, LyricsView) and view is not self.connecting_view:
+                kind = "message" if isinstance(view, LyricErrorView) else "lyrics"
+                self.shown.append((time.monotonic(), self.current_song.id, kind))
+
+    window = ReplayWindow()
+
+    started = time.monotonic()
+    events: list[tuple[float, str]] = []  # (when, track) for every song change
+
+    def run_session():
+        for at, action, *arguments in SESSION:
+            time.sleep(max(0.0, started + at - time.monotonic()))
+            if action == "end":
+                arcade.schedule_once(lambda _: arcade.exit(), 0)
+                return
+
+            services.apply(action, *arguments)
+            if player is not None:
+                player.changed(action)
+            if action == "play":
+                events.append((time.monotonic(), arguments[0]))
+            if action == "seek":
+                window.poll_now()  # like the user hitting Ctrl+R after scrubbing
+
+    threading.Thread(target=run_session, daemon=True, name="session").start()
+    # what window.run() does with a real window. Its headless loop calls the view's handlers directly as fast as
+    # it can, skipping dispatch_event and the update/draw rates the app sets
+    pyglet.app.run(None)
+
+    elapsed = time.monotonic() - started
+
+    time_to_view = []
+    for at, track in events:
+        shown = next(((when, kind) for when, song_id, kind in window.shown if when >= at and song_id == track), None)
+        time_to_view.append({
+            "track": track,
+            "kind": shown[1] if shown else None,
+            "ms": round((shown[0] - at) * 1000) if shown else None
+        })
+
+    app.database.close()
+    db_bytes = sum(os.path.getsize(path) for path in ("lyrics.db", "lyrics.db-wal") if os.path.exists(path))
+
+    stages = ("spotify poll", "local db", "lrclib get", "lrclib", "album art", "palette", "view build", "db commit")
+    report = {
+        "session seconds": round(elapsed, 1),
+        "playback source": "mpris" if args.mpris else "spotify web api",
+        "time to view": time_to_view,
+        "api calls per minute": round(window.api_calls / elapsed * 60, 1),
+        "requests": services.requests,
+        "frames": {event: summarize(samples) for event, samples in window.frame_times.items()},
+        "stages": {stage: metrics.percentiles(stage) for stage in stages},
+        "hit rates": metrics.hit_rates(),
+        "db bytes": db_bytes,
+    }
+
+    print()
+    for entry in time_to_view:
+        print(f"{entry['track']:<14} {entry['kind'] or 'never shown':<12} {'' if entry['ms'] is None else str(entry['ms']) + 'ms'}")
+
+    lyrics_times = [entry["ms"] for entry in time_to_view if entry["kind"] == "lyrics"]
+    if lyrics_times:
+        print(f"time to lyrics: median {statistics.median(lyrics_times)}ms, worst {max(lyrics_times)}ms")
+
+    print(f"playback source: {report['playback source']}")
+    print(f"api calls per minute: {report['api calls per minute']}, requests: {services.requests}")
+    for event, data in report["frames"].items():
+        print(f"{event}: {data}")
+    for stage, data in report["stages"].items():
+        print(f"{stage}: {data}")
+    print(f"hit rates: {report['hit rates']}")
+    print(f"db size: {db_bytes} bytes")
+
+    if output:
+        with open(output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    server.shutdown()
+    if bus is not None:
+        bus.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+# Measures how long main.py takes to import, to show its window and to show the first lyrics
+# usage: python benchmarks/startup_benchmark.py [runs] [timeout seconds]
+# run it from the folder with config.json, with something playing on spotify for the "first lyrics" stage
+from __future__ import annotations
+
+import os
+import sys
+import time
+import threading
+import statistics
+import subprocess
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STAGES = ("interpreter", "imported", "window", "services", "first poll", "first lyrics")
+
+
+def run_once(timeout: float) -> dict[str, float]:
+    # seconds from spawning the process to each stage main.py reports
+    env = dict(os.environ, LYRICS_STARTUP_BENCHMARK="1", PYTHONUNBUFFERED="1")
+    spawned = time.time()
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, "main.py")],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        text=True,
+        env=env
+    )
+
+    timer = threading.Timer(timeout, process.terminate)  # a stuck run still ends
+    timer.start()
+
+    stages = {}
+    try:
+        assert process.stdout is not None
+        for line in process.stdout:
+            if line.startswith("STARTUP "):
+                stage, at = line[8:].rsplit(" ", 1)
+                stages[stage] = float(at) - spawned
+                if stage == "first lyrics":
+                    break
+    finally:
+        timer.cancel()
+        process.terminate()  # no on_close, so config.json is left alone
+        process.wait()
+
+    return stages
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    timeout = float(sys.argv[2]) if len(sys.argv) > 2 else 30
+
+    baseline = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "pass"], check=True)
+        baseline.append(time.perf_counter() - start)
+
+    results: dict[str, list[float]] = {stage: [] for stage in STAGES}
+    for i in range(runs):
+        stages = run_once(timeout)
+        print(f"run {i + 1}: " + ", ".join(f"{stage} {round(at * 1000)}ms" for stage, at in stages.items()))
+        for stage, at in stages.items():
+            results.setdefault(stage, []).append(at)
+
+    print()
+    print(f"{'bare interpreter':<16} median {round(statistics.median(baseline) * 1000):>6}ms")
+    for stage, times in results.items():
+        if not times:
+            print(f"{stage:<16} never reached")
+            continue
+
+        print(f"{stage:<16} median {round(statistics.median(times) * 1000):>6}ms  min {round(min(times) * 1000):>6}ms  ({len(times)}/{runs} runs)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+import threading
+
+from collections import OrderedDict
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from db import Database
+
+
+_MISSING = -1  # remembered so songs without a saved color don't query the database every time
+
+
+class ColorCache:
+    # the saved background color of each song, loaded from the colors table on demand and capped at `max_size` songs
+    def __init__(self, database: Database, max_size: int):
+        self.database = database
+        self.max_size = max(max_size, 1)
+
+        self.entries: OrderedDict[str, int] = OrderedDict()  # song id -> color, least recently used first
+        self._lock = threading.Lock()  # used from the poller and the colors thread
+
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, song_id: str) -> int | None:
+        with self._lock:
+            color = self.entries.get(song_id)
+            if color is not None:
+                self.entries.move_to_end(song_id)
+                self.hits += 1
+                return None if color == _MISSING else color
+
+            self.misses += 1
+
+        data = self.database.fetchone("SELECT color FROM colors WHERE song_id = ?", (song_id,))
+        color = int(data[0]) if data is not None else _MISSING
+
+        with self._lock:
+            color = self.entries.setdefault(song_id, color)  # a color set while we were querying wins
+            self._evict()
+
+        return None if color == _MISSING else color
+
+    def set(self, song_id: str, color: int):
+        with self._lock:
+            self.entries[song_id] = color
+            self.entries.move_to_end(song_id)
+            self._evict()
+
+    def _evict(self):
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def summary(self) -> str:
+        total = self.hits + self.misses
+        rate = round(self.hits / total * 100) if total else 0
+        return f"{self.hits} hits, {self.misses} misses ({rate}%), {len(self.entries)}/{self.max_size} songs"
@@ -40,14 +40,18 @@ class CustomCommandView(CommandView):
         self.background_view.readjust(width, height)
 
     def resized(self, width, height):
-        self.background_view.resized(width, height)
+        if isinstance(self.background_view, LyricErrorView):  # nothing to lay out, it only needs centering again
+            self.background_view.resized(width, height)
+        else:
+            self.background_view.readjust(width, height)  # it isn't updated while we're open, so a debounced resize would never land
 
 
 @command()
 def exit(ctx: CommandContext):
     window: Window = ctx.window  # type: ignore
     window.save_config()
-    ctx.database.close()
+    if ctx.database is not None:  # still connecting
+        ctx.database.close()
     window.on_close()
 
 @command()
@@ -71,10 +75,7 @@ def set_font_size(ctx: CommandContext, font_size: int):
     view: LyricsView = ctx.command_view.background_view  # type: ignore
     ctx.config["font size"] = font_size
 
-    for lyric_line in view.lyrics:
-        lyric_line.font_size = font_size
-
-    view.readjust(*ctx.window.size)
+    view.set_font_size(font_size)
     ctx.send("Changed the font size to ", end="")
     ctx.send(font_size, weight=pyglet.text.Weight.BOLD, underline=(255, 255, 255, 255))
 
@@ -88,6 +89,17 @@ def set_seperation_size(ctx: CommandContext, seperation_size: int):
     ctx.send(seperation_size, weight=pyglet.text.Weight.BOLD, underline=(255, 255, 255, 255))
 
 
+@command()
+def purge_missing_lyrics(ctx: CommandContext):
+    if ctx.database is None:
+        ctx.send("Still connecting, try again in a bit")
+        return
+
+    count = ctx.database.fetchone("SELECT count(*) FROM missing_lyrics")[0]
+    ctx.database.write("DELETE FROM missing_lyrics")
+    ctx.send(f"Forgot {count} songs without lyrics")
+
+
 @command()
 def get_song_data(ctx: CommandContext):
     window: Window = ctx.window  # type: ignore
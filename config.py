@@ -9,6 +9,7 @@ def get_config() -> dict:
     assert "spotify client id" in config, "Provide the client id in the config"
 
     config.setdefault("update seconds", 1)
+    config.setdefault("max update seconds", 5)
 
     config.setdefault("window center pos", (0, 0))
     config.setdefault("window size", (534, 300))
@@ -16,10 +17,27 @@ def get_config() -> dict:
     config.setdefault("font size", 20)
     config.setdefault("seperation size", 15)
 
+    config.setdefault("karaoke", True)
+
     config.setdefault("debug mode", False)
     config.setdefault("debug line", False)
 
     config.setdefault("save lyrics", False)
+    config.setdefault("missing lyrics ttl hours", 168)
+    config.setdefault("lrc directory", "")
+
+    config.setdefault("album art cache dir", "album_art")
+    config.setdefault("album art cache size mb", 50)
+    config.setdefault("color cache size", 1000)
+
+    config.setdefault("playback source", "auto")  # "auto" follows the desktop client over MPRIS on linux, "spotify" only polls the web API
+    config.setdefault("mpris player", "org.mpris.MediaPlayer2.spotify")
+    config.setdefault("mpris bus", "SESSION")
+
+    config.setdefault("metrics log", "")  # a .jsonl path, empty to not log metrics
+    config.setdefault("metrics log interval seconds", 60)
+    config.setdefault("metrics log size mb", 5)
+    config.setdefault("metrics log backups", 3)
 
     return config
 
@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import time
+import sqlite3
+import threading
+
+from collections import OrderedDict
+from typing import Any, Hashable
+
+from migrations import migrate
+from metrics import metrics
+
+
+COALESCE_SECONDS = 0.5  # a write waits this long for more writes to join its transaction
+MAX_WRITE_DELAY = 2.0  # but never longer than this after the first pending write
+
+
+class Database:
+    # reads use a connection per thread, writes are queued and committed in batches by one writer thread,
+    # so nothing that runs on the render thread ever waits on a commit
+    def __init__(self, path: str):
+        self.path = path
+
+        connection = sqlite3.connect(path)
+        migrate(connection)
+        connection.execute("PRAGMA journal_mode = WAL")  # readers don't block on the writer and vice versa
+        connection.close()
+
+        self._local = threading.local()
+        self._pending: OrderedDict[Hashable, tuple[str, tuple]] = OrderedDict()
+        self._condition = threading.Condition()
+        self._first_write: float | None = None
+        self._last_write = 0.0
+        self._closing = False
+        self._closed = False
+
+        self.writes = 0
+        self.commits = 0
+        self.last_commit_ms = 0.0
+
+        self._writer = threading.Thread(target=self._writer_loop, daemon=True, name="db writer")
+        self._writer.start()
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._local.connection = sqlite3.connect(self.path)
+        return connection
+
+    def fetchone(self, sql: str, params: tuple = ()) -> Any:
+        return self._connection().execute(sql, params).fetchone()
+
+    def fetchall(self, sql: str, params: tuple = ()) -> list:
+        return self._connection().execute(sql, params).fetchall()
+
+    def write(self, sql: str, params: tuple = (), key: Hashable | None = None):
+        # writes with the same key replace each other while they're still pending, the last one wins
+        with self._condition:
+            if self._closed:
+                print("Database is closed, dropping a write")
+                return
+
+            if key is None:
+                key = object()
+
+            self._pending[key] = (sql, params)
+            self._pending.move_to_end(key)
+
+            now = time.monotonic()
+            self._last_write = now
+            if self._first_write is None:
+                self._first_write = now
+
+            self.writes += 1
+            self._condition.notify()
+
+    def _writer_loop(self):
+        connection = sqlite3.connect(self.path)
+        connection.execute("PRAGMA synchronous = NORMAL")  # WAL keeps this safe against corruption
+
+        while True:
+            with self._condition:
+                while not self._pending and not self._closing:
+                    self._condition.wait()
+
+                if not self._pending:  # closing and nothing left to write
+                    break
+
+                while not self._closing:
+                    assert self._first_write is not None
+                    wait = min(self._last_write + COALESCE_SECONDS, self._first_write + MAX_WRITE_DELAY) - time.monotonic()
+                    if wait <= 0:
+                        break
+                    self._condition.wait(wait)
+
+                batch = list(self._pending.values())
+                self._pending.clear()
+                self._first_write = None
+
+            start = time.perf_counter()
+            try:
+                with connection:  # one transaction for the whole batch
+                    for sql, params in batch:
+                        connection.execute(sql, params)
+            except sqlite3.Error as error:
+                print("Failed to write to the database", repr(error))
+
+            self.commits += 1
+            self.last_commit_ms = (time.perf_counter() - start) * 1000
+            metrics.record("db commit", self.last_commit_ms)
+
+        connection.close()
+
+    def summary(self) -> str:
+        return f"{self.writes} writes, {self.commits} commits, {len(self._pending)} pending, last commit {round(self.last_commit_ms, 1)}ms"
+
+    def close(self):
+        # writes whatever is still pending, safe to call more than once
+        with self._condition:
+            if self._closed:
+                return
+
+            self._closed = self._closing = True
+            self._condition.notify()
+
+        self._writer.join()
+
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import time
+import threading
+import requests
+
+from urllib.parse import urlparse
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from metrics import metrics
+
+
+# (connect, read) timeouts in seconds
+TIMEOUTS = {
+    "spotify": (3.05, 5),
+    "lrclib": (3.05, 6),
+    "album art": (3.05, 10),
+}
+
+
+class HostStats:
+    __slots__ = ("requests", "failures", "retries", "total_ms")
+
+    def __init__(self):
+        self.requests = 0
+        self.failures = 0
+        self.retries = 0
+        self.total_ms = 0.0
+
+    def __repr__(self):
+        average = round(self.total_ms / self.requests) if self.requests else 0
+        return f"{self.requests} req {self.failures} fail {self.retries} retry {average}ms"
+
+
+class HttpClient:
+    # one keep-alive session for everything, so repeat requests to a host skip the TCP + TLS handshake
+    def __init__(self, retries: int = 2):
+        self.session = requests.Session()
+        self.stats: dict[str, HostStats] = {}
+        self._lock = threading.Lock()
+
+        retry = Retry(
+            total=retries,
+            connect=retries,
+            read=1,
+            status=retries,
+            status_forcelist=(500, 502, 503, 504),  # 429s are left to the caller so it can back off properly
+            allowed_methods={"GET"},
+            backoff_factor=0.3,
+            backoff_jitter=0.3,
+            raise_on_status=False,
+            respect_retry_after_header=False  # otherwise urllib3 quietly sleeps through 429s itself
+        )
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=retry)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self.session.hooks["response"].append(self._on_response)
+
+    def _host_stats(self, url: str) -> HostStats:
+        host = urlparse(url).hostname or url
+        with self._lock:
+            return self.stats.setdefault(host, HostStats())
+
+    def _on_response(self, response: requests.Response, *args, **kwargs):
+        stats = self._host_stats(response.url)
+        retries = response.raw.retries if response.raw is not None else None
+        with self._lock:
+            stats.requests += 1
+            stats.total_ms += response.elapsed.total_seconds() * 1000
+            if retries is not None:
+                stats.retries += len(retries.history)
+            if response.status_code >= 400:
+                stats.failures += 1
+
+    def record_failure(self, url: str):
+        stats = self._host_stats(url)
+        with self._lock:
+            stats.failures += 1
+
+    def get(self, endpoint: str, url: str, **kwargs) -> requests.Response | None:
+        # None when the host couldn't be reached at all, even after retrying
+        start = time.perf_counter()
+        try:
+            return self.session.get(url, timeout=TIMEOUTS[endpoint], **kwargs)
+        except requests.RequestException as error:
+            self.record_failure(url)
+            print(f"{endpoint} request failed after {round(time.perf_counter() - start, 2)}s:", repr(error))
+            return None
+        finally:
+            metrics.record(endpoint, (time.perf_counter() - start) * 1000)  # retries included, it's what the caller waited
+
+    def summary(self) -> str:
+        with self._lock:
+            return ", ".join(f"{host}: {stats}" for host, stats in self.stats.items()) or "none"
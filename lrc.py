@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+import re
+import sys
+import zlib
+
+from array import array
+
+
+# a timeline is a list of (start in ms, text, words) tuples, it's what gets stored and what the providers return.
+# words are (start in ms, index of the word's first character in text) pairs, empty when the lyrics only have line timings
+Words = tuple[tuple[int, int], ...]
+Timeline = list[tuple[int, str, Words]]
+
+LINE_TAG = re.compile(r"\[(\d+):(\d{1,2})(?:[.:](\d{1,3}))?]")
+WORD_TAG = re.compile(r"<(\d+):(\d{1,2})(?:[.:](\d{1,3}))?>")
+OFFSET_TAG = re.compile(r"\[offset:\s*([+-]?\d+)\s*]", re.IGNORECASE)
+
+
+def _to_ms(minutes: str, seconds: str, fraction: str | None) -> int:
+    # the fraction can be hundredths ("05.40") or thousandths ("05.400")
+    return (int(minutes) * 60 + int(seconds)) * 1000 + (int(fraction.ljust(3, "0")) if fraction else 0)
+
+
+def _format_time(ms: int) -> str:
+    minutes, ms = divmod(max(ms, 0), 60_000)
+    seconds, ms = divmod(ms, 1000)
+    return f"{minutes:02}:{seconds:02}.{ms // 10:02}"
+
+
+def split_words(raw: str) -> tuple[str, Words]:
+    # "<00:01.00>Hello <00:01.50>world" -> ("Hello world", ((1000, 0), (1500, 6)))
+    parts = WORD_TAG.split(raw)
+    if len(parts) == 1:
+        return raw.strip(), ()
+
+    text = parts[0]
+    words = []
+    for i in range(1, len(parts), 4):
+        words.append((_to_ms(*parts[i:i + 3]), len(text)))
+        text += parts[i + 3]
+
+    leading = len(text) - len(text.lstrip())
+    text = text.strip()
+
+    starts: dict[int, int] = {}  # a tag at the very end only marks when the last word stops
+    for start, index in words:
+        index = max(index - leading, 0)
+        if index < len(text):
+            starts[index] = start
+
+    return text, tuple((start, index) for index, start in sorted(starts.items()))
+
+
+def join_words(text: str, words: Words) -> str:
+    if not words:
+        return text
+
+    pieces = []
+    previous = 0
+    for start, index in words:
+        pieces.append(text[previous:index])
+        pieces.append(f"<{_format_time(start)}>")
+        previous = index
+
+    pieces.append(text[previous:])
+    return "".join(pieces)
+
+
+def parse_lrc(synced_lyrics: str) -> Timeline:
+    # one pass over the lines. Understands lines with several timestamps, [offset:] and <mm:ss.xx> word timings
+    offset = 0
+    timeline: Timeline = []
+
+    for line in synced_lyrics.splitlines():
+        line = line.strip()
+        if not line.startswith("["):
+            continue
+
+        stamps = []
+        position = 0
+        while match := LINE_TAG.match(line, position):
+            stamps.append(_to_ms(*match.groups()))
+            position = match.end()
+
+        if not stamps:
+            if match := OFFSET_TAG.match(line):
+                offset = int(match[1])
+            continue
+
+        text, words = split_words(line[position:])
+        if not text:
+            continue
+
+        for stamp in stamps:  # a repeated line, word timings belong to the first timestamp
+            shift = stamp - stamps[0]
+            timeline.append((stamp, text, tuple((start + shift, index) for start, index in words)))
+
+    if offset:  # a positive offset means the lyrics should show up sooner
+        timeline = [
+            (stamp - offset, text, tuple((start - offset, index) for start, index in words))
+            for stamp, text, words in timeline
+        ]
+
+    timeline.sort(key=lambda line: line[0])
+    return timeline
+
+
+def to_lrc(timeline: Timeline) -> str:
+    return "\n".join(f"[{_format_time(start)}] {join_words(text, words)}" for start, text, words in timeline)
+
+
+def add_pauses(timeline: Timeline) -> list[dict]:
+    # the lines LyricsView shows, with a ♪ line in long instrumental breaks
+    lines: list[dict] = []
+    for start, text, words in timeline:
+        if lines:
+            last_start = lines[-1]["start"]
+            if start - last_start > 7000:  # more than a 7 second lyrics pause
+                lines.append({
+                    "start": last_start + 2000,
+                    "text": "♪",
+                    "words": ()
+                })
+
+        lines.append({
+            "start": start,
+            "text": text,
+            "words": words
+        })
+
+    return lines
+
+
+def pack_timeline(timeline: Timeline) -> tuple[bytes, bytes]:
+    # start times as little endian int32s, the texts (with their word tags) as one zlib compressed blob separated by NULs
+    start_times = array("i", (start for start, _, _ in timeline))
+    if sys.byteorder == "big":
+        start_times.byteswap()
+
+    texts = zlib.compress("\0".join(join_words(text, words) for _, text, words in timeline).encode(), 9)
+    return start_times.tobytes(), texts
+
+
+def unpack_timeline(start_times: bytes, texts: bytes) -> Timeline:
+    starts = array("i")
+    starts.frombytes(start_times)
+    if sys.byteorder == "big":
+        starts.byteswap()
+
+    timeline = []
+    for start, text in zip(starts, zlib.decompress(texts).decode().split("\0")):
+        if "<" in text:
+            timeline.append((start, *split_words(text)))
+        else:
+            timeline.append((start, text, ()))
+
+    return timeline  # type: ignore
+
+
+def read_timeline(synced_lyrics: str | None, start_times: bytes | None, texts: bytes | None) -> Timeline:
+    # rows saved before the packed format only have the LRC text
+    if start_times is not None and texts is not None:
+        return unpack_timeline(start_times, texts)
+
+    return parse_lrc(synced_lyrics or "")
@@ -0,0 +1,159 @@
+# Bulk import/export between a folder of .lrc files and lyrics.db
+# usage: python lrc_tool.py import <folder> [--db lyrics.db] [--batch-size 1000]
+#        python lrc_tool.py export <folder> [--db lyrics.db]
+from __future__ import annotations
+
+import os
+import re
+import time
+import sqlite3
+import argparse
+
+from typing import Iterator
+from migrations import migrate
+from lrc import parse_lrc, pack_timeline, read_timeline, to_lrc
+
+
+TAG = re.compile(r"^\[(?P<tag>ar|al|ti|length):(?P<value>[^\]]*)]\s*$", re.MULTILINE | re.IGNORECASE)
+INVALID_FILE_CHARS = re.compile(r'[<>:"/\\|?*\x00-\x1f]')
+
+
+def parse_length(value: str) -> float | None:
+    # "3:25", "03:25.40" or plain seconds
+    try:
+        if ":" in value:
+            minutes, seconds = value.split(":", 1)
+            return int(minutes) * 60 + float(seconds)
+        return float(value)
+    except ValueError:
+        return None
+
+
+def format_length(duration: float) -> str:
+    minutes, seconds = divmod(round(duration), 60)
+    return f"{minutes}:{seconds:02}"
+
+
+def iter_lrc_files(folder: str) -> Iterator[str]:
+    for root, _, files in os.walk(folder):
+        for file in files:
+            if file.lower().endswith(".lrc"):
+                yield os.path.join(root, file)
+
+
+def read_lrc(path: str) -> tuple | None:
+    # returns a row for the lyrics table, or None when the file doesn't say enough to be matched to a song
+    with open(path, encoding="utf-8-sig", errors="replace") as f:
+        text = f.read()
+
+    tags = {match["tag"].lower(): match["value"].strip() for match in TAG.finditer(text)}
+
+    stem = os.path.splitext(os.path.basename(path))[0]
+    artist, _, title = stem.partition(" - ")
+    if not title:
+        artist, title = "", stem
+
+    track_name = tags.get("ti") or title
+    artist_names = tags.get("ar") or artist
+    duration = parse_length(tags["length"]) if "length" in tags else None
+    if not track_name or not artist_names or duration is None:
+        return None
+
+    timeline = parse_lrc(text)
+    if not timeline:
+        return None
+
+    return artist_names, tags.get("al", ""), track_name, duration, *pack_timeline(timeline)
+
+
+def import_folder(database: sqlite3.Connection, folder: str, batch_size: int):
+    start = time.perf_counter()
+    imported = skipped = 0
+    batch = []
+
+    def flush():
+        nonlocal imported
+        with database:  # one transaction per batch
+            cur = database.executemany(
+                "INSERT OR IGNORE INTO lyrics (artist_names, album_name, track_name, duration, start_times, lines) VALUES (?, ?, ?, ?, ?, ?)",
+                batch
+            )
+            imported += max(cur.rowcount, 0)
+        batch.clear()
+
+        elapsed = time.perf_counter() - start
+        print(f"{imported} imported, {skipped} skipped, {round((imported + skipped) / elapsed)} files/s")
+
+    for path in iter_lrc_files(folder):
+        row = read_lrc(path)
+        if row is None:
+            skipped += 1
+            continue
+
+        batch.append(row)
+        if len(batch) >= batch_size:
+            flush()
+
+    if batch:
+        flush()
+
+    print(f"Done in {round(time.perf_counter() - start, 2)}s, files without a title, artist, [length:] tag or timed lines were skipped")
+
+
+def export_folder(database: sqlite3.Connection, folder: str):
+    os.makedirs(folder, exist_ok=True)
+    start = time.perf_counter()
+    exported = 0
+    used: set[str] = set()  # lowercased, windows doesn't care about case. Files from an earlier export get overwritten
+
+    cur = database.execute(  # same order every time, so re-exporting gives every song the same file name again
+        "SELECT artist_names, album_name, track_name, duration, synced_lyrics, start_times, lines FROM lyrics ORDER BY rowid"
+    )
+    for artist_names, album_name, track_name, duration, *lyrics in cur:  # streams, the table is never loaded at once
+        name = INVALID_FILE_CHARS.sub("_", f"{artist_names} - {track_name}")
+        if name.lower() in used:  # same song on another album, or with another length
+            name = INVALID_FILE_CHARS.sub("_", f"{name} ({album_name})")
+
+        unique, count = name, 2
+        while unique.lower() in used:
+            unique = f"{name} ({count})"
+            count += 1
+        used.add(unique.lower())
+
+        path = os.path.join(folder, unique + ".lrc")
+
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(f"[ar:{artist_names}]\n[al:{album_name}]\n[ti:{track_name}]\n[length:{format_length(duration)}]\n")
+            f.write(to_lrc(read_timeline(*lyrics)))
+            f.write("\n")
+
+        exported += 1
+        if exported % 1000 == 0:
+            print(f"{exported} exported, {round(exported / (time.perf_counter() - start))} files/s")
+
+    print(f"Exported {exported} songs in {round(time.perf_counter() - start, 2)}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import/export .lrc files into lyrics.db")
+    parser.add_argument("action", choices=("import", "export"))
+    parser.add_argument("folder")
+    parser.add_argument("--db", default="lyrics.db")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    database = sqlite3.connect(args.db)
+    migrate(database)
+    database.execute("PRAGMA synchronous = NORMAL")
+
+    try:
+        if args.action == "import":
+            import_folder(database, args.folder, args.batch_size)
+        else:
+            export_folder(database, args.folder)
+    finally:
+        database.close()
+
+
+if __name__ == "__main__":
+    main()
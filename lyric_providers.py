@@ -0,0 +1,276 @@
+from __future__ import annotations
+
+import os
+import time
+import threading
+
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import TYPE_CHECKING
+from lrc import Timeline, parse_lrc
+from metrics import metrics
+
+if TYPE_CHECKING:
+    from main import Song
+    from http_client import HttpClient
+
+
+class LyricsMissing(Exception):
+    # raised by a provider that knows for sure it has nothing for the song, as opposed to just failing
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class ProviderStats:
+    __slots__ = ("calls", "hits", "total_ms")
+
+    def __init__(self):
+        self.calls = 0
+        self.hits = 0
+        self.total_ms = 0.0
+
+    def __repr__(self):
+        average = round(self.total_ms / self.calls) if self.calls else 0
+        return f"{self.hits}/{self.calls} {average}ms"
+
+
+class LyricProvider:
+    name: str = "provider"
+    network: bool = False  # network providers run concurrently, local ones in order before them
+    deadline: float = 5.0  # seconds before a network provider's answer stops mattering
+
+    def fetch(self, song: Song) -> Timeline | None:
+        # returns the synced lyrics, None when it couldn't find out, raises LyricsMissing when there are none
+        raise NotImplementedError
+
+
+class LocalDatabaseProvider(LyricProvider):
+    name = "local db"
+
+    def fetch(self, song: Song) -> Timeline | None:
+        return song._get_local_data()
+
+
+class LrcDirectoryProvider(LyricProvider):
+    # .lrc files named "<artists> - <title>.lrc" (or just "<title>.lrc") anywhere under `directory`
+    name = "lrc files"
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.index: dict[str, str] | None = None
+
+    def _build_index(self) -> dict[str, str]:
+        index = {}
+        for root, _, files in os.walk(self.directory):
+            for file in files:
+                stem, extension = os.path.splitext(file)
+                if extension.lower() == ".lrc":
+                    index.setdefault(stem.casefold(), os.path.join(root, file))
+
+        return index
+
+    def fetch(self, song: Song) -> Timeline | None:
+        if not self.directory or not os.path.isdir(self.directory):
+            return None
+
+        if self.index is None:
+            self.index = self._build_index()
+
+        assert song.data is not None
+        title = song.data["item"]["name"]
+        artists = [artist["name"] for artist in song.data["item"]["artists"]]
+
+        for stem in (f"{'-'.join(artists)} - {title}", f"{', '.join(artists)} - {title}", f"{artists[0]} - {title}", title):
+            path = self.index.get(stem.casefold())
+            if path is not None:
+                with open(path, encoding="utf-8-sig") as f:
+                    return parse_lrc(f.read())
+
+        return None
+
+
+class LrclibGetProvider(LyricProvider):
+    name = "lrclib get"
+    network = True
+    deadline = 6.0
+
+    def __init__(self, http: HttpClient, base_url: str = "https://lrclib.net/api"):
+        self.http = http
+        self.base_url = base_url
+
+    def fetch(self, song: Song) -> Timeline | None:
+        assert song.data is not None
+
+        params = {
+            "track_name": song.data["item"]["name"],
+            "artist_name": "-".join(artist["name"] for artist in song.data["item"]["artists"]),
+            "album_name": song.data["item"]["album"]["name"],
+            "duration": song.data["item"]["duration_ms"] / 1000
+        }
+
+        data = self.http.get(
+            "lrclib",
+            f"{self.base_url}/get",
+            params=params
+        )
+
+        if data is None:
+            return None
+
+        if data.status_code != 200:
+            print("NOT BUENO", data.status_code)
+            if data.status_code == 404:
+                raise LyricsMissing("not found")
+            return None
+
+        json = data.json()
+        if json["instrumental"]:
+            print("INSTRUMENTAL")
+            raise LyricsMissing("instrumental")
+
+        synced_lyrics = json["syncedLyrics"]
+        if synced_lyrics is None:
+            print("No Synced lyrics")
+            raise LyricsMissing("not synced")
+
+        print("Got data from lrclib")
+        return parse_lrc(synced_lyrics)
+
+
+class LrclibSearchProvider(LyricProvider):
+    # finds lyrics when spotify's album name or artist credits don't match what lrclib has
+    name = "lrclib search"
+    network = True
+    deadline = 8.0
+
+    def __init__(self, http: HttpClient, base_url: str = "https://lrclib.net/api"):
+        self.http = http
+        self.base_url = base_url
+
+    def fetch(self, song: Song) -> Timeline | None:
+        assert song.data is not None
+
+        duration = song.data["item"]["duration_ms"] / 1000
+        params = {
+            "track_name": song.data["item"]["name"],
+            "artist_name": song.data["item"]["artists"][0]["name"],
+        }
+
+        data = self.http.get(
+            "lrclib",
+            f"{self.base_url}/search",
+            params=params
+        )
+
+        if data is None or data.status_code != 200:
+            return None
+
+        results = [
+            result for result in data.json()
+            if result.get("syncedLyrics") and result.get("duration") is not None and abs(result["duration"] - duration) <= 2
+        ]
+        if not results:
+            raise LyricsMissing("not found")
+
+        print("Got data from lrclib search")
+        return parse_lrc(min(results, key=lambda result: abs(result["duration"] - duration))["syncedLyrics"])
+
+
+class LyricResolver:
+    def __init__(self, max_workers: int = 4):
+        self.providers: list[LyricProvider] = []
+        self.stats: dict[str, ProviderStats] = {}
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="lyrics")
+        self._lock = threading.Lock()
+
+    def register(self, provider: LyricProvider) -> LyricProvider:
+        self.providers.append(provider)
+        self.stats[provider.name] = ProviderStats()
+        return provider
+
+    def _record(self, provider: LyricProvider, start: float, hit: bool):
+        stats = self.stats[provider.name]
+        ms = (time.perf_counter() - start) * 1000
+        with self._lock:
+            stats.calls += 1
+            stats.total_ms += ms
+            stats.hits += hit
+
+        metrics.record(provider.name, ms)
+
+    def _run(self, provider: LyricProvider, song: Song) -> Timeline | None:
+        start = time.perf_counter()
+        try:
+            timeline = provider.fetch(song)
+        except LyricsMissing:
+            self._record(provider, start, False)
+            raise
+        except Exception as error:
+            print(f"{provider.name} failed:", repr(error))
+            timeline = None
+
+        timeline = timeline or None  # lyrics without a single timed line are as good as none
+        self._record(provider, start, timeline is not None)
+        return timeline
+
+    def resolve_local(self, song: Song) -> Timeline | None:
+        for provider in self.providers:
+            if not provider.network:
+                try:
+                    timeline = self._run(provider, song)
+                except LyricsMissing:
+                    continue
+
+                if timeline is not None:
+                    return timeline
+
+        return None
+
+    def resolve_network(self, song: Song) -> tuple[Timeline | None, str | None]:
+        # runs every network provider at once and returns (lyrics, None) for the first hit,
+        # or (None, reason) when every provider said for sure that it has nothing
+        start = time.monotonic()
+        futures = {
+            self.executor.submit(self._run, provider, song): provider
+            for provider in self.providers if provider.network
+        }
+        pending = set(futures)
+        reasons = []
+
+        while pending:
+            now = time.monotonic()
+            expired = {future for future in pending if now - start >= futures[future].deadline}
+            for future in expired:
+                print(f"{futures[future].name} missed its deadline")
+                future.cancel()
+            pending -= expired
+
+            if not pending:
+                break
+
+            timeout = min(futures[future].deadline for future in pending) - (now - start)
+            done, pending = wait(pending, timeout=max(timeout, 0), return_when=FIRST_COMPLETED)
+
+            for future in done:
+                try:
+                    timeline = future.result()
+                except LyricsMissing as missing:
+                    reasons.append(missing.reason)
+                    continue
+
+                if timeline is not None:
+                    for other in pending:
+                        other.cancel()  # already running ones finish in the background and get ignored
+                    return timeline, None
+
+        if not reasons or len(reasons) < len(futures):  # someone failed or ran out of time, so we don't really know
+            return None, None
+
+        if "instrumental" in reasons:
+            return None, "instrumental"
+
+        return None, reasons[0]
+
+    def summary(self) -> str:
+        with self._lock:
+            return ", ".join(f"{name}: {stats}" for name, stats in self.stats.items())
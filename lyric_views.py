@@ -1,169 +1,589 @@
 from __future__ import annotations
 
+import math
+import time
 import arcade
 import pyglet
 
+from bisect import bisect_right
+from collections import OrderedDict
 from typing import TYPE_CHECKING
-from config import get_config
+from config import config  # main fills in the defaults with get_config before any view exists
 from arcade import clock
+from arcade.math import rotate_point
+from arcade.shape_list import ShapeElementList, create_triangles_strip_filled_with_colors
 
 if TYPE_CHECKING:
     from main import Window
+    from lrc import Words
 
 
-config = get_config()
+SCROLL_DURATION = 0.3  # seconds a scroll to the next line takes
+FADE_DURATION = 0.4  # seconds the album colors take to fade in
+
+BUILD_BUDGET = 0.006  # seconds of line layout allowed per frame, whatever doesn't fit gets laid out over the next frames
+PREWARM_LINES = 30  # upcoming lines whose glyphs get rendered into the font atlas ahead of time
+RESIZE_DEBOUNCE = 0.2  # seconds a resize has to settle before the lines get wrapped again
+FONT_NAME = "Circular Std Black"
+
+ARC_RADIUS = 10
+ARC_SEGMENTS = 64
+ARC_STEPS = 20  # the poll countdown only ever shows this many different arcs, so it only needs a redraw that often
+
+
+def ease_out_cubic(t: float) -> float:
+    return 1 - (1 - t) ** 3
+
+
+def lerp_color(a, b, t: float) -> tuple[int, int, int]:
+    return tuple(round(x + (y - x) * t) for x, y in zip(a[:3], b[:3]))  # type: ignore
+
+
+def create_arc(step: int, color) -> ShapeElementList:
+    # the same ring draw_arc_outline makes, centered on (0, 0) and uploaded once instead of every frame
+    inside = (ARC_RADIUS - ARC_RADIUS / 4) / 2
+    outside = (ARC_RADIUS + ARC_RADIUS / 4) / 2
+
+    points = []
+    for segment in range(-round(ARC_SEGMENTS * step / ARC_STEPS), 1):
+        theta = 2.0 * math.pi * segment / ARC_SEGMENTS
+        for radius in (inside, outside):
+            points.append(rotate_point(radius * math.cos(theta), radius * math.sin(theta), 0, 0, 270))
+
+    shape_list = ShapeElementList()
+    shape_list.append(create_triangles_strip_filled_with_colors(points, [color] * len(points)))
+    return shape_list
+
+
+class LayoutCache:
+    # heights of wrapped lines keyed by (text, width, font size, font), so measuring a line doesn't need glyphs for it
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.entries: OrderedDict[tuple, int] = OrderedDict()  # least recently used first
+
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: tuple) -> int | None:
+        height = self.entries.get(key)
+        if height is None:
+            self.misses += 1
+            return None
+
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return height
+
+    def set(self, key: tuple, height: int):
+        self.entries[key] = height
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+
+layout_cache = LayoutCache(4096)
 
 
 class LyricLine(arcade.Text):
-    def __init__(self, start_time_ms, *args, **kwargs):
-        super().__init__(*args, **kwargs)
+    def __init__(self, start_time_ms, text: str, *args, **kwargs):
+        karaoke = config["karaoke"]
+        super().__init__("" if karaoke else text, *args, **kwargs)  # karaoke swaps the document, no use wrapping the text twice
         self.start_time_ms = int(start_time_ms)
 
         self.lyric_view: LyricsView | None = None
+        self.sung: bool | None = None
+
+        self.words: Words = ()
+        self.sung_chars = 0  # how many characters karaoke mode has lit up
+        if karaoke:
+            self._use_formatted_document(text)
+
+    def _use_formatted_document(self, text: str):
+        # a Label's document can only be styled as a whole, a formatted one lets karaoke recolour single words
+        label = self._label
+        document = pyglet.text.document.FormattedDocument(text)
+        document.set_style(0, len(text), dict(label.document.styles))  # type: ignore
+        label.document = document
 
     def __repr__(self):
         return f"<LyricLine start={round(self.start_time_ms / 1000, 2)}, text={self.text}>"
 
-    def update(self):
+    def update(self, sung: bool, force: bool = False):
+        # Assigning .color rewrites the vertex colours, so only do it when the state actually flips
         assert self.lyric_view is not None
 
-        window: Window = arcade.get_window()  # type: ignore
-        current_song = window.current_song
+        if sung == self.sung and not force:
+            return
+
+        self.sung = sung
+        self.sung_chars = len(self.text) if sung else 0
+        self.color = (*self.lyric_view.text_color, 255 if sung else 140)
+
+    def update_words(self, progress) -> bool:
+        # karaoke, lights the line up word by word. Only the characters that changed get recoloured, returns whether any did
+        assert self.lyric_view is not None
+
+        if not self.words or not config["karaoke"]:
+            return False
 
-        if current_song.progress_ms >= self.start_time_ms:
-            self.color = (*self.lyric_view.text_color, 255)
+        index = bisect_right(self.words, progress, key=lambda word: word[0])  # words that have started
+        if index == 0:
+            end = 0
+        elif index < len(self.words):
+            end = self.words[index][1]
         else:
-            self.color = (*self.lyric_view.text_color, 140)
+            end = len(self.text)
+
+        if end == self.sung_chars:
+            return False
+
+        low, high = sorted((self.sung_chars, end))
+        color = (*self.lyric_view.text_color, 255 if end > self.sung_chars else 140)
+        self._label.document.set_style(low, high, {"color": color})
+        self.sung_chars = end
+        return True
+
+
+class LyricRecord:
+    # lightweight stand-in for a lyric line, the glyphs only exist while it's near the viewport
+    __slots__ = ("start_time_ms", "text", "words", "height", "y", "line")
+
+    def __init__(self, start_time_ms, text: str, words: Words = ()):
+        self.start_time_ms = int(start_time_ms)
+        self.text = text
+        self.words = words
+
+        self.height: int | None = None  # measured the first time the line gets laid out
+        self.y: int | None = None  # top of the line in layout space, only known around the anchor line
+        self.line: LyricLine | None = None
+
+    def __repr__(self):
+        return f"<LyricRecord start={round(self.start_time_ms / 1000, 2)}, text={self.text}>"
+
 
 class LyricsView(arcade.View):
     window: Window
 
-    def __init__(self, window: Window, lyrics: list[LyricLine], background_color: tuple[int, int, int], text_color: tuple[int, int, int]):
+    def __init__(self, window: Window, records: list[LyricRecord], background_color: tuple[int, int, int], text_color: tuple[int, int, int]):
         super().__init__(window, background_color)
         self.text_color = text_color
 
-        self.lyrics = sorted(lyrics, key=lambda l: l.start_time_ms)
+        self.records = sorted(records, key=lambda r: r.start_time_ms)
         self.batch = pyglet.graphics.Batch()
 
-        for lyric_line in self.lyrics:
-            lyric_line.batch = self.batch
-            lyric_line.lyric_view = self
+        self.pool: list[LyricLine] = []  # laid out lines that scrolled away and can be recycled
+        self.live: range = range(0)  # indices of the records inside the viewport
+        self.materialized: set[int] = set()  # indices of the records that currently own a LyricLine
+        self.offset = 0  # screen y = layout y + offset, applied through the camera rather than to every line
 
-        self.latest_lyric_line: LyricLine = lyrics[0]
-        self.readjust(*window.size)
+        self.camera = arcade.Camera2D()
+        self.scroll_start = 0
+        self.scroll_target = 0
+        self.scroll_elapsed = 0.0
 
-    def update_colors(self, data):
-        self.background_color = data["background"]
-        self.text_color: tuple[int, int, int] = data["text"]
+        self.fade: tuple[dict, dict] | None = None  # (from, to) colors while fading
+        self.fade_elapsed = 0.0
 
-    def on_update(self, _):
-        window: Window = self.window  # type: ignore
-        progress = window.current_song.progress_ms
+        self.start_times = [record.start_time_ms for record in self.records]
+        self.current_index = -1  # index of the last line whose start time has passed, -1 before the first line
 
-        current_line = self.lyrics[0]
-        for i, lyric_line in enumerate(self.lyrics, start=1):
-            lyric_line.update()
-            if lyric_line.start_time_ms <= progress:
-                current_line = self.lyrics[i - 1]
-                # print(lyric_line.start_time_ms, progress, current_line.start_time_ms)
+        self.arc_step = 0
+        self.arc_shapes: dict[int, ShapeElementList] = {}  # step -> shape in the current text color
 
-        # if progress < self.lyrics[0].start_time_ms:
-        #     current_line = self.lyrics[0]
-        # else:
-        #     current_line = max(self.lyrics, key=lambda l: (l.start_time_ms <= progress, l.start_time_ms))
+        self.font_size = config["font size"]
+        self.layout_size: tuple[int, int] = window.size  # the window size the lines are currently wrapped for
+        self.resize_pending = 0.0  # seconds left before a resize gets laid out, see `resized`
 
-        if current_line == self.latest_lyric_line:
-            return
-        elif current_line.y >= (window.height // 2 + current_line.content_height // 2):
-            self.latest_lyric_line = current_line
-            return
+        self.filled = False  # whether every line in the viewport has been laid out, see `_sync_window`
+        self.warmed = 0  # records before this one have had their glyphs pre-rendered
+
+        self.dirty = True  # something on screen changed since the last draw, the window only redraws often while it is
+        self.readjust(*window.size)
+
+    @property
+    def lyrics(self) -> list[LyricLine]:
+        return [self.records[i].line for i in self.live]  # type: ignore
+
+    def update_colors(self, data):
+        self.fade = None
+        self._set_colors(data["background"], data["text"])
+
+    def _set_colors(self, background, text):
+        self.background_color = background
+        self.text_color: tuple[int, int, int] = text
+        self.arc_shapes.clear()
+        self.dirty = True
 
-        num = min(8, window.height // 2 - (current_line.y - current_line.content_height // 2))
         for lyric_line in self.lyrics:
-            lyric_line.y += num
+            lyric_line.update(bool(lyric_line.sung), force=True)
 
-    @classmethod
-    def from_data(cls, data):
-        window: Window = arcade.get_window()  # type: ignore
+    def fade_colors(self, data):
+        current = {"background": tuple(self.background_color)[:3], "text": self.text_color}
+        self.fade = (current, data)
+        self.fade_elapsed = 0.0
 
-        lyrics = []
-        text_color = data["colors"]["text"]
+    def _update_fade(self, delta_time):
+        if self.fade is None:
+            return
 
-        y = window.height
-        for i, line in enumerate(data["lyrics"]):
+        self.fade_elapsed += delta_time
+        t = min(1.0, self.fade_elapsed / FADE_DURATION)
+        start, end = self.fade
+        self._set_colors(lerp_color(start["background"], end["background"], t), lerp_color(start["text"], end["text"], t))
+
+        if t >= 1:
+            self.fade = None
+
+    def set_font_size(self, font_size: int):
+        self.font_size = font_size  # pooled lines pick it up when they're reused
+        self.readjust(*self.window.size)
+
+    def seek(self, progress) -> int:
+        # moves the playback cursor to `progress` and recolours only the lines that crossed it
+        index = self.current_index
+        start_times = self.start_times
+
+        if index >= 0 and progress < start_times[index]:  # went backwards, most likely a seek
+            index = bisect_right(start_times, progress) - 1
+        elif index + 2 < len(start_times) and progress >= start_times[index + 2]:  # skipped more than a line ahead
+            index = bisect_right(start_times, progress) - 1
+        else:  # normal playback, at most one line ahead
+            while index + 1 < len(start_times) and progress >= start_times[index + 1]:
+                index += 1
+
+        old_index = self.current_index
+        if index != old_index:
+            self.dirty = True
+
+        low, high = min(index, old_index) + 1, max(index, old_index) + 1
+        for i in range(max(low, self.live.start), min(high, self.live.stop)):
+            self.records[i].line.update(i <= index)  # type: ignore
+
+        self.current_index = index
+        return index
+
+    def reset_cursor(self, progress):
+        self.current_index = bisect_right(self.start_times, progress) - 1
+        for i in self.live:
+            self.records[i].line.update(i <= self.current_index)  # type: ignore
+
+    @property
+    def current_record(self) -> LyricRecord:
+        return self.records[max(self.current_index, 0)]
+
+    def _acquire(self, index: int) -> LyricLine:
+        record = self.records[index]
+        if record.line is not None:
+            return record.line
+
+        if self.pool:
+            lyric_line = self.pool.pop()
+            label = lyric_line._label
+            label.begin_update()  # one relayout for the new text, width and font size together
+            lyric_line.start_time_ms = record.start_time_ms
+            lyric_line.text = record.text
+            self._style(lyric_line)
+            label.end_update()
+            lyric_line.visible = True
+        else:
+            x, width = self._line_bounds()
             lyric_line = LyricLine(
-                line["start"],
-                text=line["text"],
-                x=0,
-                y=y,
-                font_name="Circular Std Black",
-                font_size=config["font size"],
+                record.start_time_ms,
+                text=record.text,
+                x=x,
+                y=0,
+                font_name=FONT_NAME,
+                font_size=self.font_size,
                 multiline=True,
-                width=arcade.get_window().width,
-                # anchor_x="center",
+                width=width,
                 anchor_y="top",
-                color=(*text_color, 140)
+                color=(*self.text_color, 140),
+                batch=self.batch
             )
+            lyric_line.lyric_view = self
+
+        lyric_line.words = record.words
+        lyric_line.update(index <= self.current_index, force=True)
+
+        record.line = lyric_line
+        self.materialized.add(index)
+        if record.height is None:
+            record.height = lyric_line.content_height
+            layout_cache.set(self._layout_key(record), record.height)
+
+        return lyric_line
+
+    def _release(self, index: int):
+        record = self.records[index]
+        if record.line is None:
+            return
+
+        record.line.visible = False
+        self.pool.append(record.line)
+        record.line = None
+        self.materialized.discard(index)
+
+    def _line_bounds(self) -> tuple[int, int]:
+        width = self.layout_size[0]
+        return width // 16, width - (width // 16) * 2
+
+    def _layout_key(self, record: LyricRecord) -> tuple:
+        return record.text, self._line_bounds()[1], self.font_size, FONT_NAME
+
+    def _style(self, lyric_line: LyricLine):
+        # brings a line up to the current width and font size, call between begin_update and end_update
+        x, width = self._line_bounds()
+        if lyric_line.x != x:
+            lyric_line.x = x
+        if lyric_line.width != width:
+            lyric_line.width = width
+        if lyric_line.font_size != self.font_size:
+            lyric_line.font_size = self.font_size
+
+    def _measure(self, index: int) -> int:
+        record = self.records[index]
+        if record.height is None:
+            record.height = layout_cache.get(self._layout_key(record))
+
+        if record.height is None:  # never wrapped at this size, lay it out for real
+            self._acquire(index)
+
+        return record.height  # type: ignore
+
+    def _place(self, index: int) -> int:
+        # extends the known layout by one line, the neighbour must already be placed
+        record = self.records[index]
+        if record.y is None:
+            separation = config["seperation size"]
+            if index + 1 < len(self.records) and self.records[index + 1].y is not None:
+                below = self.records[index + 1]
+                record.y = below.y + self._measure(index) + separation  # type: ignore
+            else:
+                above = self.records[index - 1]
+                record.y = above.y - self._measure(index - 1) - separation  # type: ignore
+
+        return record.y
+
+    def _anchor(self, index: int):
+        # throws the layout away and starts it again from `index`, used after resizes and big seeks
+        for record in self.records:
+            record.y = None
+
+        self.records[index].y = 0
+        self._snap(self._target_offset(index))
+
+    def _snap(self, offset):
+        self.offset = self.scroll_start = self.scroll_target = offset
+        self.scroll_elapsed = SCROLL_DURATION
+        self._apply_offset()
+        self._sync_window()
+
+    def _scroll_to(self, offset):
+        if offset == self.scroll_target:
+            return
+
+        if abs(offset - self.offset) > self.window.height:  # big seek, crawling there would just look like lag
+            self._snap(offset)
+            return
+
+        self.scroll_start = self.offset
+        self.scroll_target = offset
+        self.scroll_elapsed = 0.0
+
+    def _apply_offset(self):
+        width, height = self.layout_size  # not the window's, while a resize is pending the camera scales the old layout
+        self.camera.position = (width / 2, height / 2 - self.offset)
+        self.dirty = True
+
+    def _target_offset(self, index: int) -> int:
+        record = self.records[index]
+        return self.window.height // 2 + self._measure(index) // 2 - record.y  # type: ignore
+
+    def _is_placed(self, index: int) -> bool:
+        if self.records[index].y is not None:
+            return True
+
+        neighbours = (index - 1, index + 1)
+        return any(0 <= i < len(self.records) and self.records[i].y is not None for i in neighbours)
+
+    def _sync_window(self):
+        # materializes the lines inside the viewport (plus a margin), recycles the rest.
+        # Lays out the current line first and then its neighbours, until BUILD_BUDGET runs out. `on_update` does the rest later
+        if not self.records:
+            return
+
+        deadline = time.perf_counter() + BUILD_BUDGET
+
+        height = self.window.height
+        margin = height // 2
+        top = height - self.offset + margin
+        bottom = -self.offset - margin
+
+        anchor = max(self.current_index, 0)  # always placed by the time we get here
+        self._acquire(anchor)
+
+        first = last = anchor
+        above = below = True
+        going_down = True  # alternates, upcoming lines first
+        while (above or below) and time.perf_counter() < deadline:
+            if below and (going_down or not above):
+                if last + 1 < len(self.records) and self._place(last + 1) >= bottom:
+                    last += 1
+                    self._acquire(last)
+                else:
+                    below = False
+            elif first > 0 and self._place(first - 1) - self._measure(first - 1) <= top:
+                first -= 1
+                self._acquire(first)
+            else:
+                above = False
+
+            going_down = not going_down
+
+        self.filled = not (above or below)
+
+        live = range(first, last + 1)
+        for i in self.materialized - set(live):  # scrolled away, or only laid out to be measured
+            self._release(i)
+
+        for i in live:
+            lyric_line = self.records[i].line
+            y = self.records[i].y
+            if lyric_line.y != y:  # type: ignore
+                lyric_line.y = y  # type: ignore
+
+        if live != self.live:
+            self.dirty = True
+        self.live = live
+
+    def _prewarm(self):
+        # renders the glyphs of the next few lines into the font atlas, so laying them out later doesn't have to
+        end = min(len(self.records), max(self.live.stop, self.current_index + 1) + PREWARM_LINES)
+        if self.warmed >= end or not self.live:
+            return
+
+        label = self.records[self.live.start].line._label  # type: ignore
+        font = label.document.get_font(0, dpi=label.dpi)
+
+        deadline = time.perf_counter() + BUILD_BUDGET
+        self.warmed = max(self.warmed, self.live.stop)
+        while self.warmed < end and time.perf_counter() < deadline:
+            font.get_glyphs(self.records[self.warmed].text)
+            self.warmed += 1
+
+    def _update_arc(self):
+        perc = min(1, (clock.GLOBAL_CLOCK.time - self.window.last_check) / self.window.poll_interval)
+        step = int(perc * ARC_STEPS)
+        if step != self.arc_step:
+            self.arc_step = step
+            self.dirty = True
+
+    def on_update(self, delta_time):
+        self._update_fade(delta_time)
+        self._update_arc()
+        if not self.records:
+            return
+
+        window: Window = self.window  # type: ignore
+        progress = window.current_song.progress_ms
+        self.seek(progress)
 
-            y -= lyric_line.content_height + 15
+        current_line = self.records[self.current_index].line if self.current_index >= 0 else None
+        if current_line is not None and current_line.words and current_line.update_words(progress):
+            self.dirty = True
 
-            lyrics.append(lyric_line)
+        if self.resize_pending > 0:  # the preview doesn't scroll, the layout is about to change anyway
+            self.resize_pending -= delta_time
+            if self.resize_pending <= 0:
+                self.readjust(*self.window.size)
+            return
+
+        index = max(self.current_index, 0)
+        if not self._is_placed(index):  # jumped outside of the known layout
+            self._anchor(index)
+            return
+
+        self._place(index)
+        self._scroll_to(self._target_offset(index))
+        if self.scroll_elapsed >= SCROLL_DURATION:  # not scrolling
+            if not self.filled:
+                self._sync_window()
+            else:
+                self._prewarm()
+            return
+
+        self.scroll_elapsed += delta_time
+        t = min(1.0, self.scroll_elapsed / SCROLL_DURATION)
+        self.offset = self.scroll_start + (self.scroll_target - self.scroll_start) * ease_out_cubic(t)
+        if t >= 1:
+            self.offset = self.scroll_target
+
+        self._apply_offset()
+        self._sync_window()
 
+    @classmethod
+    def from_data(cls, data):
+        window: Window = arcade.get_window()  # type: ignore
+
+        records = [LyricRecord(line["start"], line["text"], line.get("words", ())) for line in data["lyrics"]]
         return cls(
             window,
-            lyrics,
+            records,
             background_color=data["colors"]["background"],
-            text_color=text_color
+            text_color=data["colors"]["text"]
         )
 
     def readjust(self, width, height):
-        window: Window = self.window  # type: ignore
-        progress = window.current_song.progress_ms
+        self.dirty = True
+        self.layout_size = (width, height)
+        self.resize_pending = 0.0
+        self.camera.zoom = 1.0
+        if not self.records:
+            return
 
-        if progress < self.lyrics[0].start_time_ms:
-            current_line = self.lyrics[0]
-        else:
-            current_line = max(self.lyrics, key=lambda l: (l.start_time_ms <= progress, l.start_time_ms))
+        window: Window = self.window  # type: ignore
+        self.reset_cursor(window.current_song.progress_ms)
 
-        self.latest_lyric_line = current_line
+        for record in self.records:
+            record.height = None
 
-        y = height
-        for lyric_line in self.lyrics:
-            lyric_line.x = width // 16
-            lyric_line.width = width - lyric_line.x * 2
-            lyric_line.y = y
-            y -= lyric_line.content_height + config["seperation size"]
+        for i in self.materialized:  # only what's on screen gets wrapped now, pooled lines catch up when reused
+            record = self.records[i]
+            label = record.line._label  # type: ignore
+            label.begin_update()
+            self._style(record.line)  # type: ignore
+            label.end_update()
 
-        wanted_y = height // 2 + current_line.content_height // 2
-        current_y = current_line.y
+            record.height = record.line.content_height  # type: ignore
+            layout_cache.set(self._layout_key(record), record.height)
 
-        diff = wanted_y - current_y
-
-        for lyric_line in self.lyrics:
-            lyric_line.y += diff
+        self.camera.match_window()
+        self._anchor(max(self.current_index, 0))
 
     def resized(self, width, height):
-        self.readjust(width, height)
+        # dragging a corner calls this for every step of the drag. Until it settles the old layout is just scaled to fit
+        if not self.records:
+            self.readjust(width, height)
+            return
+
+        self.resize_pending = RESIZE_DEBOUNCE
+        self.camera.match_window()
+        self.camera.zoom = width / self.layout_size[0]
+        self._apply_offset()
 
     def on_draw(self):
         self.clear()
 
-        radius = 10
-        perc = min(1, (clock.GLOBAL_CLOCK.time - self.window.last_check) / config["update seconds"])
-        arcade.draw_arc_outline(
-            center_x=self.width - radius,
-            center_y=self.height - radius,
-            width=radius,
-            height=radius,
-            color=(*self.text_color, 140),
-            start_angle=-360 * perc,
-            end_angle=0,
-            tilt_angle=270,
-            border_width=radius / 2,
-            num_segments=256
-        )
+        if self.arc_step:
+            arc = self.arc_shapes.get(self.arc_step)
+            if arc is None:
+                arc = self.arc_shapes[self.arc_step] = create_arc(self.arc_step, (*self.text_color, 140))
+
+            arc.position = (self.width - ARC_RADIUS, self.height - ARC_RADIUS)
+            arc.draw()
 
-        self.batch.draw()
+        with self.camera.activate():
+            self.batch.draw()
 
         if config["debug line"]:
             arcade.draw_line(0, self.height // 2, self.width, self.height // 2, (0, 0, 0), 3)
@@ -173,35 +593,35 @@ class LyricsView(arcade.View):
         #     arcade.draw_lbwh_rectangle_filled(0, 0, self.width * (song.progress_ms / song.data["item"]["duration_ms"]), self.height / 32, (*self.text_color, 100))
 
         self.window.debug_screen.draw()
+        self.dirty = False
 
 
 class LyricErrorView(LyricsView):
     def __init__(self, window: Window, message: str):
-        lyrics = [
-            LyricLine(
-                0,
-                text=message,
-                x=window.width // 2,
-                y=window.height // 2,
-                font_name="Circular Std Black",
-                font_size=35,
-                # multiline=True,
-                # width=arcade.get_window().width,
-                anchor_x="center",
-                anchor_y="center",
-                color=(230, 230, 230)
-            )
-        ]
-
-        super().__init__(window, lyrics=lyrics, background_color=(51, 51, 51), text_color=(230, 230, 230))
+        super().__init__(window, records=[], background_color=(51, 51, 51), text_color=(230, 230, 230))
+
+        self.message = arcade.Text(
+            text=message,
+            x=window.width // 2,
+            y=window.height // 2,
+            font_name=FONT_NAME,
+            font_size=35,
+            # multiline=True,
+            # width=arcade.get_window().width,
+            anchor_x="center",
+            anchor_y="center",
+            color=(230, 230, 230),
+            batch=self.batch
+        )
 
     def resized(self, width, height):
-        lyric_line = self.lyrics[0]
-        lyric_line.x = width // 2
-        lyric_line.y = height // 2
+        self.camera.match_window(position=True)
+        self.message.x = width // 2
+        self.message.y = height // 2
+        self.dirty = True
 
-    def on_update(self, _):
-        self.resized(*self.size)
+    def on_show_view(self):
+        self.resized(*self.window.size)  # the window might have changed size since this was made
 
     @classmethod
     def from_data(cls, message):
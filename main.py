@@ -1,25 +1,44 @@
 from __future__ import annotations
 
-import pyglet.libs.win32.constants
-pyglet.libs.win32.constants.HWND_NOTOPMOST = pyglet.libs.win32.constants.HWND_TOPMOST  # make window always on-top. Is there a better way?
+import startup
+startup.mark("interpreter")
 
-import re
+import sys
+if sys.platform == "win32":  # the module only imports on windows
+    import pyglet.libs.win32.constants
+    pyglet.libs.win32.constants.HWND_NOTOPMOST = pyglet.libs.win32.constants.HWND_TOPMOST  # make window always on-top. Is there a better way?
+
+import os
 import arcade
 import pyglet
 import typing
-import spotipy
-import sqlite3
-import requests
+import time
+import random
 import threading
 
+from concurrent.futures import ThreadPoolExecutor
+
 from arcade import clock
 from typing import TYPE_CHECKING
-from spotipy.oauth2 import SpotifyOAuth
 from config import get_config, save_config
-from Pylette import extract_colors, Color as ColorLette
 from utilities.arcade_utilities import DebugScreen, PiPWindow, CommandView
-from lyric_views import LyricsView, LyricErrorView
+from lyric_views import LyricsView, LyricErrorView, layout_cache
 from commands import CustomCommandView
+from db import Database
+from color_cache import ColorCache
+from playback_clock import PlaybackClock
+from lrc import Timeline, add_pauses, pack_timeline, read_timeline
+from metrics import metrics
+from playback_sources import PlaybackSource, PlaybackUnavailable, SpotifyWebSource, MprisSource
+
+if TYPE_CHECKING:
+    import spotipy
+    import requests
+
+    from spotipy.exceptions import SpotifyException
+    from http_client import HttpClient
+    from album_art import AlbumArtCache
+    from lyric_providers import LyricResolver
 
 # Setup
 arcade.enable_timings()
@@ -27,41 +46,109 @@ arcade.enable_timings()
 config = get_config()
 print(config)
 
-database = sqlite3.connect("lyrics.db", check_same_thread=False)
-database.execute("CREATE TABLE IF NOT EXISTS lyrics (artist_names TEXT, album_name TEXT, track_name TEXT, duration FLOAT, synced_lyrics TEXT, PRIMARY KEY(artist_names, album_name, track_name, duration))")
-database.execute("CREATE TABLE IF NOT EXISTS colors (song_id TEXT PRIMARY KEY, color TEXT)")
+color_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="colors")  # album art + palette, off the lyrics path
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+arcade.resources.add_resource_handle("fonts", ROOT)
+arcade.load_font(os.path.join(ROOT, "CircularStd_Black.otf"))
+
+FRAME_RATE = 1 / 60
+IDLE_UPDATE_RATE = 1 / 10  # nothing is playing, polls and input still get picked up this often
+IDLE_DRAW_RATE = 1 / 2  # nothing on screen changed, redrawing now and then is just a safety net
+
+# shown on the debug screen, see metrics.py
+LATENCY_STAGES = ("spotify poll", "local db", "lrclib", "album art", "palette", "view build", "on_update", "on_draw", "db commit")
+
+metrics.add_source("on_update", lambda: [t * 1000 for t in arcade.get_timings().get("on_update", ())])
+metrics.add_source("on_draw", lambda: [t * 1000 for t in arcade.get_timings().get("on_draw", ())])
+metrics.add_rate("layouts", lambda: (layout_cache.hits, layout_cache.misses))
+
+# set by `load_services` on the poller thread, so the window shows up before any of this gets imported or opened
+database: Database
+colors: ColorCache
+http: HttpClient
+lyric_resolver: LyricResolver
+album_art: AlbumArtCache
+spotify: spotipy.Spotify
+playback_sources: list[PlaybackSource]  # asked in order, see `Window._current_playback`
+_services_loaded = False
 
-_data = database.execute("SELECT song_id, color FROM colors")
-COLORS = {song_id: int(color) for song_id, color in _data.fetchall()}
 
+def load_services():
+    global database, colors, http, lyric_resolver, album_art, spotify, playback_sources, requests, SpotifyException
+    global _services_loaded
 
-arcade.resources.add_resource_handle("fonts", r"C:\Users\gomaa\PycharmProjects\SpotifyTest")
-arcade.load_font(r"C:\Users\gomaa\PycharmProjects\SpotifyTest\CircularStd_Black.otf")
+    if _services_loaded:  # benchmarks/replay_benchmark.py loads them itself to swap in its own servers
+        return
 
-spotify = spotipy.Spotify(
-    auth_manager=SpotifyOAuth(
-        scope="user-read-private,user-read-email,user-read-currently-playing",
-        client_id=config["spotify client id"],
-        client_secret=config["spotify client secret"],
-        redirect_uri="http://localhost:5173/callback"
+    import spotipy
+    import requests
+
+    from spotipy.oauth2 import SpotifyOAuth
+    from spotipy.exceptions import SpotifyException
+    from http_client import HttpClient, TIMEOUTS
+    from album_art import AlbumArtCache
+    from lyric_providers import LyricResolver, LocalDatabaseProvider, LrcDirectoryProvider, LrclibGetProvider, LrclibSearchProvider
+
+    database = Database("lyrics.db")
+    colors = ColorCache(database, config["color cache size"])
+
+    http = HttpClient()
+
+    lyric_resolver = LyricResolver()
+    lyric_resolver.register(LocalDatabaseProvider())
+    lyric_resolver.register(LrcDirectoryProvider(config["lrc directory"]))
+    lyric_resolver.register(LrclibGetProvider(http))
+    lyric_resolver.register(LrclibSearchProvider(http))
+
+    album_art = AlbumArtCache(config["album art cache dir"], config["album art cache size mb"] * 1024 * 1024, http)
+
+    spotify = spotipy.Spotify(
+        auth_manager=SpotifyOAuth(
+            scope="user-read-private,user-read-email,user-read-currently-playing",
+            client_id=config["spotify client id"],
+            client_secret=config["spotify client secret"],
+            redirect_uri="http://localhost:5173/callback",
+            requests_session=http.session
+        ),
+        requests_session=http.session,  # our session doesn't retry 429s, the poller handles them so it can respect Retry-After
+        requests_timeout=TIMEOUTS["spotify"]
     )
-)
+
+    playback_sources = []
+    if config["playback source"] == "auto" and sys.platform.startswith("linux"):
+        playback_sources.append(MprisSource(config["mpris player"], config["mpris bus"], config["max update seconds"]))
+    playback_sources.append(SpotifyWebSource(spotify))  # always last, it works everywhere
+
+    metrics.add_rate("colors", lambda: (colors.hits, colors.misses))
+    metrics.add_rate("album art", lambda: (album_art.hits, album_art.misses))
+    local_lyrics = lyric_resolver.stats[LocalDatabaseProvider.name]
+    metrics.add_rate("local lyrics", lambda: (local_lyrics.hits, local_lyrics.calls - local_lyrics.hits))
+
+    if config["metrics log"]:
+        metrics.start_log(
+            config["metrics log"],
+            config["metrics log interval seconds"],
+            config["metrics log size mb"] * 1024 * 1024,
+            config["metrics log backups"]
+        )
+
+    _services_loaded = True
+    startup.mark("services")
+
+
+startup.mark("imported")
 # Setup end
 
 
 int_to_rgb = lambda num: ((num >> 16) & 0xFF, (num >> 8) & 0xFF, num & 0xFF)
 rgb_to_int = lambda rgb: (rgb[0] << 16) | (rgb[1] << 8) | rgb[2]
 
-def get_luminance(color: tuple[int, int, int] | ColorLette):
-    if isinstance(color, ColorLette):
-        color = color.rgb
-
+def get_luminance(color: tuple[int, int, int]):
     return 0.299 * color[0] + 0.587 * color[1] + 0.114 * color[2]
 
-def get_saturation(color: tuple[int, int, int] | ColorLette):
-    if isinstance(color, ColorLette):
-        color = color.rgb
-
+def get_saturation(color: tuple[int, int, int]):
     r, g, b = color
     max_c = max(r, g, b)
     min_c = min(r, g, b)
@@ -75,13 +162,15 @@ class Song:
     data: dict | None
     id:   str  | None
 
-    def __init__(self, song_data):
+    def __init__(self, song_data, rtt: float = 0.0):
         self.lyric_data = {}
+        self.missing_reason: str | None = None  # why there are no lyrics, when lrclib told us
+        self.clock = PlaybackClock()
+        self.seeked = False  # whether the last update jumped instead of drifting
         if song_data is None:
             self.data = None
             self.id = None
             self.paused = False
-            self.progress_ms = float("inf")
             self.pallete: list[tuple[int, int, int]] = []
             return
 
@@ -90,17 +179,25 @@ class Song:
         self.time = clock.GLOBAL_CLOCK.time
         self.paused = not song_data["is_playing"]
 
-        self.progress_ms = int(song_data["progress_ms"])
+        self.clock.sync(int(song_data["progress_ms"]), not self.paused, rtt)
 
         self.pallete: list[tuple[int, int, int]] = []
 
-    def update(self, song_data) -> bool | None:
+    @property
+    def progress_ms(self) -> float:
+        if self.data is None:
+            return float("inf")
+
+        return self.clock.position()
+
+    def update(self, song_data, rtt: float = 0.0) -> bool | None:
+        # `rtt` is how long the request that got `song_data` took, in seconds
         if song_data is None:
             self.lyric_data = {}
             self.data = None
             self.id = None
             self.paused = False
-            self.progress_ms = float("inf")
+            self.seeked = False
             return
 
         song_changed = False
@@ -113,66 +210,75 @@ class Song:
             self.lyric_data = {}
 
         self.id = song_data["item"]["id"]
-        self.progress_ms = int(song_data["progress_ms"])
         self.paused = not song_data["is_playing"]
+        self.seeked = self.clock.sync(int(song_data["progress_ms"]), not self.paused, rtt) and not song_changed
 
         return song_changed
 
     def __repr__(self) -> str:
         return str(self.id)
 
-    def _set_lyric_data(self, data: list):
+    def _set_lyric_data(self, timeline: Timeline):
         assert self.data is not None
 
-        synced_lyrics = ""
-
-        for line in data:
-            start_time_ms = line["start"]
-            text = line["text"]
-
-            start_time = start_time_ms / 1000
-            minutes, seconds = divmod(start_time, 60)
-            milliseconds = str(seconds - int(seconds)).split(".")[1][:2]
-            seconds = int(seconds)
-
-            synced_lyrics += f"[{int(minutes):02}:{int(seconds):02}.{milliseconds:02}] {text}\n"
-
         self.lyric_data = {
             "track_name": self.data["item"]["name"],
             "artist_names": "-".join(artist["name"] for artist in self.data["item"]["artists"]),
             "album_name": self.data["item"]["album"]["name"],
             "duration": self.data["item"]["duration_ms"] / 1000,
-            "synced_lyrics": synced_lyrics[:-1]
+            "timeline": timeline
         }
 
-    def _get_colors(self) -> dict[typing.Literal["background", "text"], tuple[int, int, int]]:
-        if self.data is None:
+    def _get_cached_colors(self) -> dict[typing.Literal["background", "text"], tuple[int, int, int]]:
+        # whatever we can show without touching the network, the real colors get applied once `_get_colors` is done
+        color = colors.get(self.id)
+        if color is not None:
+            rgb = int_to_rgb(color)
+            luma = get_luminance(rgb)
             return {
-                "background": (51, 51, 51),
-                "text": (230, 230, 230)
+                "background": rgb,
+                "text": (230, 230, 230) if luma < 40 else (25, 25, 25)
             }
 
-        image_url: str = self.data["item"]["album"]["images"][0]["url"]
-        response = requests.get(image_url)
-        if response.status_code != 200:
-            print("FUCK?")
-            return {
-                "background": (51, 51, 51),
-                "text": (230, 230, 230)
-            }
-
-        # bytes = data.text.encode()
-        # pallete = extract_dominant_color(io.BytesIO(response.content))
+        return {
+            "background": (51, 51, 51),
+            "text": (230, 230, 230)
+        }
 
-        self.pallete: list[tuple[int, int, int]] = [tuple(color.rgb) for color in extract_colors(image_url, palette_size=10).colors]  # type: ignore
+    @staticmethod
+    def _get_colors(song_id: str, song_data: dict) -> tuple[dict[typing.Literal["background", "text"], tuple[int, int, int]], list[tuple[int, int, int]], bool]:
+        # runs on `color_executor` while the poller may already be on the next song, so it only uses its arguments.
+        # returns the colors, the album's pallete and whether the color is new, `Window.apply_colors` keeps them
+        album = song_data["item"]["album"]
+        image_url: str = album["images"][0]["url"]
+        album_id: str = album.get("id") or image_url
+
+        pallete = Song._load_pallete(album_id)
+        if pallete is None:
+            image_path = album_art.get(album_id, image_url)
+            if image_path is None:
+                print("FUCK?")
+                return {
+                    "background": (51, 51, 51),
+                    "text": (230, 230, 230)
+                }, [], False
+
+            from palette import extract_palette  # numpy, only needed once a cover isn't in the database yet
+
+            with metrics.timed("palette"):
+                pallete = extract_palette(image_path, palette_size=10)
+            Song._save_pallete(album_id, pallete)
+        else:
+            print("Got pallete from the database")
 
-        if self.id in COLORS:
-            rgb = int_to_rgb(COLORS[self.id])
+        color = colors.get(song_id)
+        new_color = color is None
+        if not new_color:
+            rgb = int_to_rgb(color)
             print("Got color from the database")
         else:
             print("Got the highest saturation color")
-            rgb = max(self.pallete, key=get_saturation)
-            self._save_color(rgb)  # type: ignore
+            rgb = max(pallete, key=get_saturation)
 
         if TYPE_CHECKING:
             rgb = typing.cast(tuple[int, int, int], rgb)
@@ -180,23 +286,40 @@ class Song:
 
         luma = get_luminance(rgb)
         text = (230, 230, 230) if luma < 40 else (25, 25, 25)
-        print("Pallete", self.pallete)
+        print("Pallete", pallete)
         return {
             "background": rgb,
             "text": text,
-        }
+        }, pallete, new_color
+
+    @staticmethod
+    def _load_pallete(album_id: str) -> list[tuple[int, int, int]] | None:
+        data = database.fetchone("SELECT palette FROM palettes WHERE album_id = ?", (album_id,))
+
+        if data is None or not data[0]:
+            return None
+
+        return [int_to_rgb(int(num)) for num in data[0].split(",")]
+
+    @staticmethod
+    def _save_pallete(album_id: str, pallete: list[tuple[int, int, int]]):
+        database.write(
+            "INSERT INTO palettes (album_id, palette) VALUES (?, ?) ON CONFLICT(album_id) DO UPDATE SET palette = EXCLUDED.palette",
+            (album_id, ",".join(str(rgb_to_int(rgb)) for rgb in pallete)),
+            key=("palette", album_id)
+        )
 
     def _save_color(self, rgb: tuple[int, int, int]):
         print("Saving color", rgb)
         num = rgb_to_int(rgb)
-        COLORS[self.id] = num
-        cur = database.cursor()
-        cur.execute("INSERT INTO colors (song_id, color) VALUES (?, ?) ON CONFLICT(song_id) DO UPDATE SET color = EXCLUDED.color", (self.id, str(num)))
-        database.commit()
-        cur.close()
+        colors.set(self.id, num)
+        database.write(  # cycling through colors quickly only ends up committing the last one
+            "INSERT INTO colors (song_id, color) VALUES (?, ?) ON CONFLICT(song_id) DO UPDATE SET color = EXCLUDED.color",
+            (self.id, str(num)),
+            key=("color", self.id)
+        )
 
     def set_color(self, rgb: tuple[int, int, int]):
-        COLORS[self.id] = rgb_to_int(rgb)
         self._save_color(rgb)
 
         luma = get_luminance(rgb)
@@ -208,7 +331,7 @@ class Song:
         }
 
     def change_color(self, background, direction: typing.Literal[1, -1]) -> dict | None:
-        if self.data is None or self.id is None:
+        if self.data is None or self.id is None or not self.pallete:  # the pallete might still be getting extracted
             return None
 
         try:
@@ -223,7 +346,6 @@ class Song:
             new_index = len(self.pallete) - 1
 
         new_rgb: tuple[int, int, int] = self.pallete[new_index]
-        COLORS[self.id] = rgb_to_int(new_rgb)
         self._save_color(new_rgb)
 
         luma = get_luminance(new_rgb)
@@ -235,44 +357,26 @@ class Song:
         }
         
 
-    @staticmethod
-    def _parse_lyrics_string(synced_lyrics: str) -> dict:
-        lyric_data: dict = {
-            "lyrics": (lines := [])
-        }
-
-        pattern = r"\[(?P<minutes>\d{2}):(?P<seconds>\d{2}.\d{2})]( )?(?P<text>([^\[\\])*)?"
-        for match in re.finditer(pattern, synced_lyrics, re.RegexFlag.MULTILINE):
-            start = (int(match["minutes"]) * 60 + float(match["seconds"])) * 1000
-            text = match["text"].strip()
-            if not text:
-                continue
-
-            if lines:
-                last_start = lines[-1]["start"]
-                if start - last_start > 7000:  # more than a 7 second lyrics pause
-                    lines.append({
-                    "start": last_start + 2000,
-                    "text": "♪"
-                })
+    def _get_local_data(self) -> Timeline | None:  # I wanted this to search through files instead of a local db but that was a bit difficult
+        assert self.data is not None
 
-            lines.append({
-                "start": start,
-                "text": text
-            })
+        data = database.fetchone("""SELECT lyrics.synced_lyrics, lyrics.start_times, lyrics.lines
+                                  FROM track_lyrics
+                                  JOIN lyrics USING (artist_names, album_name, track_name, duration)
+                                  WHERE track_lyrics.track_id = ?
+                                """, (self.id,)
+        )
 
-        return lyric_data
-
-    def _get_local_data(self) -> dict | None:  # I wanted this to search through files instead of a local db but that was a bit difficult
-        assert self.data is not None
+        if data is not None:
+            print("Got data from local db")
+            return read_timeline(*data)
 
         track_name = self.data["item"]["name"]
         artist_names = "-".join(artist["name"] for artist in self.data["item"]["artists"])
         album_name = self.data["item"]["album"]["name"]
         duration = self.data["item"]["duration_ms"] / 1000
 
-        cur = database.cursor()
-        cur.execute("""SELECT synced_lyrics 
+        data = database.fetchone("""SELECT artist_names, album_name, track_name, duration, synced_lyrics, start_times, lines
                                   FROM lyrics 
                                   WHERE 
                                     track_name = ? AND
@@ -283,73 +387,84 @@ class Song:
                                 """, (track_name, artist_names, album_name, duration - 2, duration + 2)
         )
 
-        data = cur.fetchone()
-        cur.close()
+        if data is None:  # spotify might have changed the title's case or one of the credits
+            data = database.fetchone("""SELECT artist_names, album_name, track_name, duration, synced_lyrics, start_times, lines
+                                      FROM lyrics 
+                                      WHERE 
+                                        track_name = ? COLLATE NOCASE AND
+                                        duration >= ? AND
+                                        duration <= ? AND
+                                        (artist_names = ? OR album_name = ?)
+                                      ORDER BY abs(duration - ?)
+                                      LIMIT 1
+                                    """, (track_name, duration - 2, duration + 2, artist_names, album_name, duration)
+            )
+
         if data is None:
             return None
 
-        print("Got data from local db")
-        return self._parse_lyrics_string(data[0])
-
-    def _get_lrclib_data(self) -> dict | None:
-        assert self.data is not None
+        print("Got data from local db by metadata")
+        self._save_track_id(data[:4])
+        return read_timeline(*data[4:])
 
-        params = {
-            "track_name": self.data["item"]["name"],
-            "artist_name": "-".join(artist["name"] for artist in self.data["item"]["artists"]),
-            "album_name": self.data["item"]["album"]["name"],
-            "duration": self.data["item"]["duration_ms"] / 1000
-        }
-
-        data = requests.get(
-            "https://lrclib.net/api/get",
-            params=params
+    def _save_track_id(self, key: tuple):
+        # key is (artist_names, album_name, track_name, duration) of the lyrics row
+        database.write(
+            "INSERT OR REPLACE INTO track_lyrics (track_id, artist_names, album_name, track_name, duration) VALUES (?, ?, ?, ?, ?)",
+            (self.id, *key),
+            key=("track id", self.id)
         )
 
-        if data.status_code != 200:
-            print("NOT BUENO", data.status_code)
-            return
+    def _get_missing_reason(self) -> str | None:
+        data = database.fetchone("SELECT reason, checked_at FROM missing_lyrics WHERE track_id = ?", (self.id,))
 
-        json = data.json()
-        if json["instrumental"]:
-            print("INSTRUMENTAL")
-            return
+        if data is None or time.time() - data[1] > config["missing lyrics ttl hours"] * 3600:
+            return None
 
-        synced_lyrics = json["syncedLyrics"]
-        if synced_lyrics is None:
-            print("No Synced lyrics")
-            return
+        return data[0]
 
-        print("Got data from lrclib")
-        return self._parse_lyrics_string(synced_lyrics)
+    def _save_missing_reason(self, reason: str):
+        database.write(
+            "INSERT OR REPLACE INTO missing_lyrics (track_id, reason, checked_at) VALUES (?, ?, ?)",
+            (self.id, reason, time.time()),
+            key=("missing", self.id)
+        )
 
     def get_lyric_data(self):
-        for func in (self._get_local_data, self._get_lrclib_data):
-            data = func()
-            if data:
-                break
+        self.missing_reason = None
 
-        if isinstance(data, dict):
-            self._set_lyric_data(data["lyrics"])
-            if config["save lyrics"]:
-                self.save_lyric_data()
+        timeline = lyric_resolver.resolve_local(self)
+        if timeline is None:
+            self.missing_reason = self._get_missing_reason()
+            if self.missing_reason is not None:
+                print("Lyrics are known to be missing:", self.missing_reason)
+                return None
 
-            data["colors"] = self._get_colors()
+            timeline, self.missing_reason = lyric_resolver.resolve_network(self)
+            if timeline is None:
+                if self.missing_reason is not None:
+                    self._save_missing_reason(self.missing_reason)
+                return None
 
-        return data
+        self._set_lyric_data(timeline)
+        if config["save lyrics"]:
+            self.save_lyric_data()
+
+        return {
+            "lyrics": add_pauses(timeline),
+            "colors": self._get_cached_colors()
+        }
 
     def save_lyric_data(self) -> bool:
         if not self.lyric_data:
             print("No lyric data")
             return False
 
-        values = (self.lyric_data["artist_names"], self.lyric_data["album_name"], self.lyric_data["track_name"], self.lyric_data["duration"], self.lyric_data["synced_lyrics"])
+        values = (self.lyric_data["artist_names"], self.lyric_data["album_name"], self.lyric_data["track_name"], self.lyric_data["duration"], *pack_timeline(self.lyric_data["timeline"]))
 
-        cur = database.cursor()
-        cur.execute("INSERT OR IGNORE INTO lyrics (artist_names, album_name, track_name, duration, synced_lyrics) VALUES (?, ?, ?, ?, ?)", values)
-        database.commit()
-        cur.close()
+        database.write("INSERT OR IGNORE INTO lyrics (artist_names, album_name, track_name, duration, start_times, lines) VALUES (?, ?, ?, ?, ?, ?)", values)
 
+        self._save_track_id(values[:4])
         return True
 
 
@@ -360,7 +475,18 @@ class Window(PiPWindow):
         super().__init__((int(100 * 1.78), 100), *config["window size"], "Spotify Lyrics")
         self.current_song = Song(None)
         self.last_check = 0
-        self.checking: bool = False
+
+        # the poller thread, see `_poll_loop`
+        self.poll_event = threading.Event()
+        self.poll_interval: float = config["update seconds"]
+        self.fast_polls = 0  # polls left at the base rate after user input
+        self.idle_polls = 0  # polls in a row with nothing playing
+        self.rate_limit_failures = 0
+        self.rate_limited_until = 0.0
+        self.api_calls = 0
+
+        self.playback_source: PlaybackSource | None = None  # the one the last poll got its answer from
+        self.frame_rates = (FRAME_RATE, FRAME_RATE)  # (update, draw), see `_update_frame_rates`
 
         x, y = config["window center pos"]
         x -= self.width // 2
@@ -379,8 +505,35 @@ class Window(PiPWindow):
         self.debug_screen["Progress"] = lambda: round(self.current_song.progress_ms / 1000) if self.current_song.progress_ms != float('inf') else "infinite"
         self.debug_screen["Song"] = lambda: self.current_song
         self.debug_screen["Color"] = lambda: self.current_view.background_color if self.current_view else None
+        self.debug_screen["Poll interval"] = lambda: round(self.poll_interval, 2)
+        self.debug_screen["API calls"] = lambda: self.api_calls
+        self.debug_screen["Source"] = lambda: self.playback_source.name if self.playback_source else None
+        self.debug_screen["Startup"] = lambda: startup.summary()
+        for stage in LATENCY_STAGES:
+            self.debug_screen[stage] = lambda stage=stage: metrics.summary(stage)
+        self.debug_screen["Hit rates"] = lambda: metrics.rates_summary()
+
+        self.command_view = CustomCommandView(self, font="Circular Std Black", font_size=15, config=config, database=None)
+
+        self.loaded = False  # see `services_loaded`
+
+        # shown until the first poll, spotify and the database are set up behind it
+        self.connecting_view = LyricErrorView(self, "Connecting...")
+        self.show_view(self.connecting_view)
+
+        threading.Thread(target=self._poll_loop, daemon=True, name="poller").start()
 
-        self.command_view = CustomCommandView(self, font="Circular Std Black", font_size=15, config=config, database=database)
+    def services_loaded(self):
+        self.debug_screen["HTTP"] = lambda: http.summary()
+        self.debug_screen["Lyrics"] = lambda: lyric_resolver.summary()
+        self.debug_screen["DB"] = lambda: database.summary()
+        self.debug_screen["Color cache"] = lambda: colors.summary()
+
+        self.command_view.database = database
+        self.loaded = True
+
+    def connecting(self) -> bool:
+        return self.current_view is None or self.current_view is self.connecting_view
 
     def exit_command_view(self, view):
         super().show_view(view)
@@ -401,7 +554,7 @@ class Window(PiPWindow):
                 assert isinstance(self.current_view, LyricsView)
 
             if symbol == arcade.key.R and modifiers & arcade.key.MOD_CTRL:
-                self.last_check = 0
+                self.poll_now()
             elif symbol == arcade.key.S and modifiers & arcade.key.MOD_CTRL:
                 print("Saving")
                 success = self.current_song.save_lyric_data()
@@ -411,10 +564,12 @@ class Window(PiPWindow):
             elif not isinstance(self.current_view, LyricErrorView) and modifiers & arcade.key.MOD_SHIFT:
                 if symbol == arcade.key.LEFT:
                     data = self.current_song.change_color(self.current_view.background_color, -1)
-                    self.current_view.update_colors(data)
+                    if data:
+                        self.current_view.update_colors(data)
                 elif symbol == arcade.key.RIGHT:
                     data = self.current_song.change_color(self.current_view.background_color, 1)
-                    self.current_view.update_colors(data)
+                    if data:
+                        self.current_view.update_colors(data)
             elif self.current_view and symbol == arcade.key.SLASH:
                 self.command_view.on_resize(*self.size)
                 self.show_view(self.command_view)
@@ -436,35 +591,158 @@ class Window(PiPWindow):
         save_config(config)
 
     def on_draw(self):
-        pass
+        startup.mark("window")
 
     def on_close(self):
         self.save_config()
-        database.close()
+        if self.loaded:
+            database.close()
         super().on_close()
 
+    def apply_colors(self, song_id, future):
+        if future.exception() is not None:
+            print("Failed to get the colors", future.exception())
+            return
+
+        if song_id != self.current_song.id:  # the song changed before the palette was ready
+            return
+
+        song_colors, pallete, new_color = future.result()
+        self.current_song.pallete = pallete
+        if new_color:
+            self.current_song._save_color(song_colors["background"])
+
+        view = self.current_view
+        if isinstance(view, CustomCommandView):
+            view = view.background_view
+
+        if isinstance(view, LyricsView) and not isinstance(view, LyricErrorView):
+            view.fade_colors(song_colors)
+
+    def poll_now(self):
+        # the user did something, so check right away and keep checking often for a bit
+        self.fast_polls = 3
+        self.poll_event.set()
+
+    def _poll_loop(self):
+        try:
+            load_services()
+        except Exception as error:
+            print("Failed to start", repr(error))
+            arcade.schedule_once(lambda _: self.show_view(LyricErrorView(self, "Failed to start...")), 0)
+            return
+
+        arcade.schedule_once(lambda _: self.services_loaded(), 0)
+
+        for source in playback_sources:
+            source.start(self.poll_event.set)  # event driven sources wake the poller up when something changes
+
+        while True:
+            try:
+                self.update_view()
+            except Exception as error:  # one bad response shouldn't kill the only poller
+                print("Failed to update the view", repr(error))
+
+            self.poll_interval = self._next_poll_interval()
+
+            self.poll_event.wait(self.poll_interval)
+            self.poll_event.clear()
+
+    def _next_poll_interval(self) -> float:
+        base = config["update seconds"]
+        longest = config["max update seconds"]
+
+        if self.playback_source is not None and self.playback_source.event_driven:  # it tells us when something changes
+            return longest
+
+        rate_limited_for = self.rate_limited_until - clock.GLOBAL_CLOCK.time
+        if rate_limited_for > 0:
+            return rate_limited_for
+
+        if self.fast_polls:
+            self.fast_polls -= 1
+            return base
+
+        song = self.current_song
+        if song.data is None or song.paused:  # nothing is going to change by itself, back off
+            self.idle_polls = min(self.idle_polls + 1, 10)
+            return min(longest, base * 2 ** self.idle_polls)
+
+        self.idle_polls = 0
+        remaining = (song.data["item"]["duration_ms"] - song.progress_ms) / 1000
+        if remaining <= longest:  # about to change songs, poll often and just after it ends
+            return max(0.25, min(base, remaining + 0.25))
+
+        return min(longest, max(base, remaining - longest))  # middle of the track, wake up before the end
+
+    def _rate_limited(self, error: SpotifyException):
+        self.rate_limit_failures += 1
+
+        retry_after = float((error.headers or {}).get("Retry-After", 0))
+        backoff = config["update seconds"] * 2 ** min(self.rate_limit_failures, 8)
+        delay = max(retry_after, min(backoff, 300)) + random.uniform(0, 1)
+
+        print(f"Rate limited, waiting {round(delay, 1)} seconds")
+        self.rate_limited_until = clock.GLOBAL_CLOCK.time + delay
+
+    def _current_playback(self) -> tuple[dict | None, float]:
+        # asks the first source that can tell, returns what it said and how long it took in seconds
+        for source in playback_sources:
+            if not source.available():
+                continue
+
+            if source.network:
+                self.api_calls += 1
+
+            requested_at = time.monotonic()
+            try:
+                current_song = source.current_playback()  # a request for the web API, can take a while
+            except PlaybackUnavailable:  # e.g. the desktop client just quit
+                continue
+
+            rtt = time.monotonic() - requested_at
+            if source.network:
+                metrics.record("spotify poll", rtt * 1000)
+
+            self.playback_source = source
+            return current_song, rtt
+
+        raise PlaybackUnavailable("No playback source can be used")  # the web API one is always available
+
     def update_view(self):
-        self.checking = True
         try:
             print("Getting the song")
-            current_song = spotify.current_user_playing_track()  # sends a request and can take a while
-        except (requests.ConnectionError, requests.ReadTimeout):
-            print("Timed out")
-            if self.current_view is None:
+            current_song, rtt = self._current_playback()
+        except (requests.ConnectionError, requests.ReadTimeout, SpotifyException) as error:
+            if isinstance(error, SpotifyException):
+                if error.http_status != 429:
+                    raise
+
+                self._rate_limited(error)
+            else:
+                print("Timed out")
+                http.record_failure(spotify.prefix)
+
+            if self.connecting():
                 f = lambda _: self.show_view(LyricErrorView(self, "Can't detect a spotify song..."))
                 arcade.schedule_once(f, 0)
 
-            self.checking = False
             self.last_check = clock.GLOBAL_CLOCK.time
 
             return
 
-        if (self.current_view is None or not isinstance(self.current_view, LyricErrorView)) and not current_song:
+        self.rate_limit_failures = 0
+
+        startup.mark("first poll")
+
+        if (self.connecting() or not isinstance(self.current_view, LyricErrorView)) and not current_song:
             print("Can't detect song")
             f = lambda _: self.show_view(LyricErrorView(self, "Can't detect a spotify song..."))
             arcade.schedule_once(f, 0)
         else:
-            song_changed = self.current_song.update(current_song)
+            song_changed = self.current_song.update(current_song, rtt)
+            if self.current_song.seeked:  # the user is probably still scrubbing around
+                self.fast_polls = max(self.fast_polls, 1)
 
             if song_changed:
                 # TODO: Loading lyrics view
@@ -472,28 +750,47 @@ class Window(PiPWindow):
                 data = self.current_song.get_lyric_data()  # sends a request/uses the db and can take a while
                 if data is None:
                     print("No Lyrics")
-                    f = lambda _: self.show_view(LyricErrorView(self, "Sorry, can't find the lyrics for this song..."))
+                    message = "♪ Instrumental ♪" if self.current_song.missing_reason == "instrumental" else "Sorry, can't find the lyrics for this song..."
+                    f = lambda _: self.show_view(LyricErrorView(self, message))
                     arcade.schedule_once(f, 0)
                 else:
-                    f = lambda _: self.show_view(LyricsView.from_data(data))
+                    def f(_):
+                        with metrics.timed("view build"):
+                            view = LyricsView.from_data(data)
+                        self.show_view(view)
+                        startup.mark("first lyrics")
+
                     arcade.schedule_once(f, 0)
 
-        self.checking = False
+                    song_id, song_data = self.current_song.id, self.current_song.data  # the song object changes under the job
+                    future = color_executor.submit(Song._get_colors, song_id, song_data)
+                    future.add_done_callback(lambda fut: arcade.schedule_once(lambda _: self.apply_colors(song_id, fut), 0))
+
         self.last_check = clock.GLOBAL_CLOCK.time
 
     def on_update(self, td):
-        super().on_update(td)
+        super().on_update(td)  # the song's PlaybackClock keeps progress_ms moving between polls
+        self._update_frame_rates()
 
-        if clock.GLOBAL_CLOCK.time - self.last_check < config["update seconds"]:
-            if hasattr(self.current_song, "progress_ms") and not getattr(self.current_song, "paused", False):
-                self.current_song.progress_ms += td * 850
-            return
+    def _update_frame_rates(self):
+        # runs at full speed only while something on screen is changing, an idle window barely wakes up
+        view = self.current_view
+        if not isinstance(view, LyricsView) or self.debug_screen.do_draw:  # typing a command, or watching the FPS
+            rates = (FRAME_RATE, FRAME_RATE)
+        else:
+            song = self.current_song
+            playing = song.data is not None and not song.paused and not isinstance(view, LyricErrorView)
+            update_rate = FRAME_RATE if playing or view.dirty else IDLE_UPDATE_RATE
+            draw_rate = FRAME_RATE if view.dirty else IDLE_DRAW_RATE
+            rates = (update_rate, max(update_rate, draw_rate))
 
-        if self.checking is False:
-            if self.current_view:
-                self.current_view.readjust(*self.size)
+        if rates == self.frame_rates:
+            return
 
-            threading.Thread(target=self.update_view, daemon=True).start()
+        if rates[0] != self.frame_rates[0]:
+            self.set_update_rate(rates[0])
+        self.set_draw_rate(rates[1])
+        self.frame_rates = rates
 
 
 if __name__ == "__main__":
@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import json
+import time
+import logging
+import threading
+
+from collections import deque
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
+from typing import Callable, Iterable, Iterator
+
+
+HISTORY = 512  # samples kept per stage, the percentiles are over these
+
+
+def percentile(samples: list[float], q: float) -> float:
+    # nearest rank, `samples` has to be sorted
+    if not samples:
+        return 0.0
+
+    return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+class Stage:
+    __slots__ = ("samples", "count")
+
+    def __init__(self):
+        self.samples: deque[float] = deque(maxlen=HISTORY)  # milliseconds
+        self.count = 0
+
+
+class Metrics:
+    # latencies of the slow parts of getting lyrics on screen, and how often the caches save us from them
+    def __init__(self):
+        self.stages: dict[str, Stage] = {}
+        self.sources: dict[str, Callable[[], Iterable[float]]] = {}  # stages someone else keeps the samples of
+        self.rates: dict[str, Callable[[], tuple[int, int]]] = {}  # name -> (hits, misses)
+        self._lock = threading.Lock()
+
+        self._logger: logging.Logger | None = None
+
+    def record(self, stage: str, ms: float):
+        with self._lock:
+            data = self.stages.get(stage)
+            if data is None:
+                data = self.stages[stage] = Stage()
+
+            data.samples.append(ms)
+            data.count += 1
+
+    @contextmanager
+    def timed(self, stage: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, (time.perf_counter() - start) * 1000)
+
+    def add_source(self, stage: str, samples: Callable[[], Iterable[float]]):
+        self.sources[stage] = samples
+
+    def add_rate(self, name: str, counts: Callable[[], tuple[int, int]]):
+        self.rates[name] = counts
+
+    def _samples(self, stage: str) -> tuple[list[float], int]:
+        if stage in self.sources:
+            try:
+                samples = list(self.sources[stage]())
+            except RuntimeError:  # changed while we were copying it, the render thread owns it
+                samples = []
+            return sorted(samples), len(samples)
+
+        with self._lock:
+            data = self.stages.get(stage)
+            if data is None:
+                return [], 0
+
+            return sorted(data.samples), data.count
+
+    def percentiles(self, stage: str) -> dict[str, float]:
+        samples, count = self._samples(stage)
+        return {
+            "count": count,
+            "p50": round(percentile(samples, 0.5), 2),
+            "p95": round(percentile(samples, 0.95), 2),
+            "p99": round(percentile(samples, 0.99), 2),
+            "max": round(samples[-1] if samples else 0.0, 2)
+        }
+
+    def summary(self, stage: str) -> str:
+        data = self.percentiles(stage)
+        if not data["count"]:
+            return "-"
+
+        return f"p50 {data['p50']}ms p95 {data['p95']}ms p99 {data['p99']}ms max {data['max']}ms ({data['count']})"
+
+    def hit_rates(self) -> dict[str, float | None]:
+        rates = {}
+        for name, counts in self.rates.items():
+            hits, misses = counts()
+            rates[name] = round(hits / (hits + misses), 3) if hits + misses else None
+
+        return rates
+
+    def rates_summary(self) -> str:
+        return ", ".join(
+            f"{name} {'-' if rate is None else str(round(rate * 100)) + '%'}" for name, rate in self.hit_rates().items()
+        ) or "-"
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            stages = list(self.stages)
+
+        return {
+            "time": round(time.time(), 3),
+            "stages": {stage: self.percentiles(stage) for stage in stages + list(self.sources)},
+            "hit rates": self.hit_rates()
+        }
+
+    def start_log(self, path: str, interval: float, max_bytes: int, backups: int):
+        # appends a snapshot as one JSON line every `interval` seconds, rotating the file once it gets too big
+        handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups, encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(message)s"))
+
+        self._logger = logging.getLogger("metrics")
+        self._logger.propagate = False
+        self._logger.setLevel(logging.INFO)
+        self._logger.addHandler(handler)
+
+        def log_loop():
+            while True:
+                time.sleep(interval)
+                self.write_log()
+
+        threading.Thread(target=log_loop, daemon=True, name="metrics log").start()
+
+    def write_log(self):
+        if self._logger is not None:
+            self._logger.info(json.dumps(self.snapshot()))
+
+
+metrics = Metrics()
@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+import sqlite3
+
+from lrc import parse_lrc, pack_timeline
+
+
+# every function upgrades the database by one version, `PRAGMA user_version` remembers how far we got
+def _create_tables(database: sqlite3.Connection):
+    database.execute("CREATE TABLE IF NOT EXISTS lyrics (artist_names TEXT, album_name TEXT, track_name TEXT, duration FLOAT, synced_lyrics TEXT, PRIMARY KEY(artist_names, album_name, track_name, duration))")
+    database.execute("CREATE TABLE IF NOT EXISTS colors (song_id TEXT PRIMARY KEY, color TEXT)")
+
+
+def _add_palettes(database: sqlite3.Connection):
+    # the whole extracted palette per album, so picking or cycling colors never needs the cover again
+    database.execute("CREATE TABLE IF NOT EXISTS palettes (album_id TEXT PRIMARY KEY, palette TEXT)")
+
+
+def _add_track_ids(database: sqlite3.Connection):
+    # spotify track id -> key of the lyrics row, so a local hit doesn't depend on spotify's metadata staying the same.
+    # existing rows get their ids the first time the metadata lookup finds them, there's no way to know them offline
+    database.execute("CREATE TABLE IF NOT EXISTS track_lyrics (track_id TEXT PRIMARY KEY, artist_names TEXT, album_name TEXT, track_name TEXT, duration FLOAT)")
+    # for the relaxed metadata lookup, the exact one already uses the primary key
+    database.execute("CREATE INDEX IF NOT EXISTS lyrics_track_name ON lyrics (track_name COLLATE NOCASE, duration)")
+
+
+def _add_missing_lyrics(database: sqlite3.Connection):
+    # tracks lrclib had nothing (usable) for, so they don't get looked up again until `checked_at` is old enough
+    database.execute("CREATE TABLE IF NOT EXISTS missing_lyrics (track_id TEXT PRIMARY KEY, reason TEXT, checked_at FLOAT)")
+
+
+def _pack_lyrics(database: sqlite3.Connection):
+    # parsed timelines instead of LRC text, loading a song becomes a decompress instead of a regex pass
+    database.execute("ALTER TABLE lyrics ADD COLUMN start_times BLOB")
+    database.execute("ALTER TABLE lyrics ADD COLUMN lines BLOB")
+
+    rows = database.execute("SELECT rowid, synced_lyrics FROM lyrics WHERE synced_lyrics IS NOT NULL").fetchall()
+    database.executemany(
+        "UPDATE lyrics SET start_times = ?, lines = ?, synced_lyrics = NULL WHERE rowid = ?",
+        [(*pack_timeline(parse_lrc(synced_lyrics)), rowid) for rowid, synced_lyrics in rows]
+    )
+
+    if rows:
+        database.commit()
+        database.execute("VACUUM")  # hand the space the text took back to the file system
+
+
+MIGRATIONS = [
+    _create_tables,
+    _add_palettes,
+    _add_track_ids,
+    _add_missing_lyrics,
+    _pack_lyrics,
+]
+
+
+def migrate(database: sqlite3.Connection):
+    version = database.execute("PRAGMA user_version").fetchone()[0]
+
+    for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+        print("Migrating the database to version", number)
+        migration(database)
+        database.execute(f"PRAGMA user_version = {number}")
+        database.commit()
@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import numpy as np
+
+from PIL import Image
+
+
+SAMPLE_SIZE = (64, 64)  # pixels kept before quantizing, covers are already thumbnails by now
+BITS = 5  # bits kept per channel for the histogram
+
+
+def _load_pixels(image: str | Image.Image) -> np.ndarray:
+    if not isinstance(image, Image.Image):
+        image = Image.open(image)
+
+    image = image.convert("RGB")
+    image.thumbnail(SAMPLE_SIZE)
+    return np.asarray(image, dtype=np.uint8).reshape(-1, 3)
+
+
+def _histogram(pixels: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    # collapses the pixels into the distinct quantized colors and how often each one shows up
+    shift = 8 - BITS
+    quantized = (pixels >> shift).astype(np.uint32)
+    keys = (quantized[:, 0] << (BITS * 2)) | (quantized[:, 1] << BITS) | quantized[:, 2]
+
+    counts = np.bincount(keys, minlength=1 << (BITS * 3))
+    present = np.nonzero(counts)[0]
+
+    mask = (1 << BITS) - 1
+    colors = np.stack(((present >> (BITS * 2)) & mask, (present >> BITS) & mask, present & mask), axis=1)
+    colors = (colors << shift) + (1 << (shift - 1))  # middle of each bucket
+
+    return colors.astype(np.float64), counts[present].astype(np.float64)
+
+
+def _split(colors: np.ndarray, weights: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    # splits a box along its widest channel so both halves hold about the same amount of pixels
+    channel = int(np.argmax(np.ptp(colors, axis=0)))
+    order = np.argsort(colors[:, channel], kind="stable")
+
+    cumulative = np.cumsum(weights[order])
+    cut = int(np.searchsorted(cumulative, cumulative[-1] / 2))
+    cut = min(max(cut, 1), len(order) - 1)
+
+    return order[:cut], order[cut:]
+
+
+def median_cut(colors: np.ndarray, weights: np.ndarray, palette_size: int) -> list[tuple[int, int, int]]:
+    boxes = [np.arange(len(colors))]
+
+    while len(boxes) < palette_size:
+        # split whichever box has the most pixels spread over the widest range
+        scores = [
+            np.ptp(colors[box], axis=0).max() * weights[box].sum() if len(box) > 1 else -1
+            for box in boxes
+        ]
+        index = int(np.argmax(scores))
+        if scores[index] <= 0:
+            break
+
+        box = boxes.pop(index)
+        low, high = _split(colors[box], weights[box])
+        boxes += [box[low], box[high]]
+
+    boxes.sort(key=lambda box: weights[box].sum(), reverse=True)  # most common first, like Pylette
+
+    palette = []
+    for box in boxes:
+        mean = np.average(colors[box], axis=0, weights=weights[box])
+        palette.append(tuple(int(round(c)) for c in mean))
+
+    return palette  # type: ignore
+
+
+def extract_palette(image: str | Image.Image, palette_size: int = 10) -> list[tuple[int, int, int]]:
+    colors, weights = _histogram(_load_pixels(image))
+    return median_cut(colors, weights, palette_size)
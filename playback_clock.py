@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+import time
+
+
+SEEK_THRESHOLD_MS = 1500  # anything further off than this is treated as a seek and snapped to
+SLEW_SECONDS = 2  # how long small corrections get spread over
+MAX_SLEW_RATE = 0.1  # never run more than 10% fast or slow while correcting
+
+
+class PlaybackClock:
+    # extrapolates the playback position between polls in real time and eases towards what spotify reports.
+    # The poller syncs it while the render thread reads it every frame, so the whole state is swapped in as one
+    # tuple and `position` only reads it once, a reader never sees half of an update
+    def __init__(self):
+        now = time.monotonic()
+        # (base_ms, base_time, rate while slewing, slew_until, playing)
+        self._state: tuple[float, float, float, float, bool] = (0.0, now, 1.0, now, False)
+
+    @property
+    def playing(self) -> bool:
+        return self._state[4]
+
+    @staticmethod
+    def _position(state: tuple[float, float, float, float, bool], now: float) -> float:
+        base_ms, base_time, rate, slew_until, playing = state
+        if not playing:
+            return base_ms
+
+        elapsed = now - base_time
+        slewing = max(0.0, min(elapsed, slew_until - base_time))
+        return base_ms + slewing * 1000 * rate + (elapsed - slewing) * 1000
+
+    def position(self, now: float | None = None) -> float:
+        state = self._state
+        return self._position(state, time.monotonic() if now is None else now)
+
+    def sync(self, progress_ms: float, playing: bool, rtt: float = 0.0) -> bool:
+        # `rtt` is the request round trip in seconds, spotify measured `progress_ms` somewhere in the middle of it
+        # returns True when the difference was big enough to count as a seek
+        now = time.monotonic()
+        state = self._state
+        was_playing = state[4]
+
+        if not playing:
+            self._state = (progress_ms, now, 1.0, now, False)
+            return False
+
+        estimate = progress_ms + rtt / 2 * 1000
+        current = self._position(state, now)
+        error = estimate - current
+
+        if not was_playing or abs(error) > SEEK_THRESHOLD_MS:
+            self._state = (estimate, now, 1.0, now, True)
+            return was_playing
+
+        rate = 1 + max(-MAX_SLEW_RATE, min(MAX_SLEW_RATE, error / (SLEW_SECONDS * 1000)))
+        slew_seconds = abs(error) / (abs(rate - 1) * 1000) if rate != 1 else 0
+        self._state = (current, now, rate, now + slew_seconds, True)
+        return False
@@ -0,0 +1,235 @@
+from __future__ import annotations
+
+import time
+import threading
+
+from typing import TYPE_CHECKING, Any, Callable
+from playback_clock import SEEK_THRESHOLD_MS
+
+try:
+    from jeepney import DBusAddress, DBusErrorResponse, HeaderFields, MatchRule, Properties, message_bus
+    from jeepney.io.blocking import DBusConnection, Proxy, open_dbus_connection
+except ImportError:  # only needed for MPRIS, which only exists on linux anyway
+    open_dbus_connection = None
+
+if TYPE_CHECKING:
+    import spotipy
+
+
+class PlaybackUnavailable(Exception):
+    # the source can't say what's playing right now, the next one gets asked instead
+    pass
+
+
+class PlaybackSource:
+    name: str = "source"
+    network: bool = True  # every `current_playback` call is a request against the API quota
+    event_driven: bool = False  # calls `on_change` by itself when something changes, so it barely needs polling
+
+    def start(self, on_change: Callable[[], None]):
+        pass
+
+    def available(self) -> bool:
+        return True
+
+    def current_playback(self) -> dict | None:
+        # what spotify's currently-playing endpoint returns (only the parts Song uses), None when nothing is playing
+        raise NotImplementedError
+
+
+class SpotifyWebSource(PlaybackSource):
+    name = "spotify web api"
+
+    def __init__(self, spotify: spotipy.Spotify):
+        self.spotify = spotify
+
+    def current_playback(self) -> dict | None:
+        return self.spotify.current_user_playing_track()
+
+
+MPRIS_PATH = "/org/mpris/MediaPlayer2"
+MPRIS_PLAYER = "org.mpris.MediaPlayer2.Player"
+
+
+def _unwrap(variant: tuple[str, Any]) -> Any:
+    # jeepney gives D-Bus variants as (signature, value)
+    return variant[1]
+
+
+class MprisSource(PlaybackSource):
+    # the desktop client's MPRIS interface on the session bus. Knows about song changes, pauses and seeks
+    # as soon as they happen, without a request. `bus` can be the address of a private bus to test against a mock player
+    name = "mpris"
+    network = False
+    event_driven = True
+
+    def __init__(self, player: str = "org.mpris.MediaPlayer2.spotify", bus: str = "SESSION", refresh_seconds: float = 5.0):
+        self.player = player
+        self.bus = bus
+        self.refresh_seconds = refresh_seconds  # how often Position gets read again while playing, see `_read_position`
+
+        self.owner: str | None = None  # unique bus name of the player while it's running
+        self.metadata: dict[str, Any] = {}
+        self.status = "Stopped"
+        self.position_us = 0  # at `anchor`
+        self.anchor = time.monotonic()
+        self._checked_at = self.anchor  # when the position was last known for sure, see `_listen`
+
+        self._lock = threading.Lock()
+        self._connection: DBusConnection | None = None
+        self._on_change: Callable[[], None] = lambda: None
+
+    def start(self, on_change: Callable[[], None]):
+        if open_dbus_connection is None:
+            print("Install jeepney to follow spotify over MPRIS, polling the web API instead")
+            return
+
+        try:
+            self._connection = open_dbus_connection(self.bus)
+        except Exception as error:  # no session bus, e.g. a headless machine
+            print("Can't connect to D-Bus, polling the web API instead:", repr(error))
+            return
+
+        self._on_change = on_change
+        threading.Thread(target=self._listen, daemon=True, name="mpris").start()
+
+    def available(self) -> bool:
+        return self.owner is not None
+
+    def _properties(self) -> Proxy:
+        assert self._connection is not None
+        return Proxy(Properties(DBusAddress(MPRIS_PATH, bus_name=self.player, interface=MPRIS_PLAYER)), self._connection)
+
+    def _refresh(self):
+        # reads everything again, the Position property doesn't send PropertiesChanged when it moves
+        try:
+            properties = self._properties().get_all()[0]
+        except DBusErrorResponse as error:
+            print("Failed to read the MPRIS properties:", error)
+            return
+
+        with self._lock:
+            self.metadata = {key: _unwrap(value) for key, value in _unwrap(properties["Metadata"]).items()} if "Metadata" in properties else {}
+            self.status = _unwrap(properties.get("PlaybackStatus", ("s", "Stopped")))
+            self.position_us = _unwrap(properties.get("Position", ("x", 0)))
+            self.anchor = self._checked_at = time.monotonic()
+
+    def _read_position(self) -> bool:
+        # a missed Seeked signal or the client stalling to buffer only shows up here. True when it was far off
+        try:
+            position_us = _unwrap(self._properties().get("Position")[0])
+        except DBusErrorResponse as error:
+            print("Failed to read the MPRIS position:", error)
+            return False
+
+        with self._lock:
+            now = time.monotonic()
+            expected_us = self.position_us + (now - self.anchor) * 1_000_000
+            self.position_us = position_us
+            self.anchor = self._checked_at = now
+
+        return abs(position_us - expected_us) > SEEK_THRESHOLD_MS * 1000
+
+    def _find_owner(self) -> str | None:
+        try:
+            return Proxy(message_bus, self._connection).GetNameOwner(self.player)[0]  # type: ignore
+        except DBusErrorResponse:  # not running
+            return None
+
+    def _listen(self):
+        connection = self._connection
+        assert connection is not None
+
+        bus = Proxy(message_bus, connection)
+        player_signals = MatchRule(type="signal", path=MPRIS_PATH)  # PropertiesChanged and Seeked
+        owner_changes = MatchRule(type="signal", sender="org.freedesktop.DBus", interface="org.freedesktop.DBus", member="NameOwnerChanged")
+        owner_changes.add_arg_condition(0, self.player)
+        bus.AddMatch(player_signals)
+        bus.AddMatch(owner_changes)
+
+        with connection.filter(MatchRule(type="signal"), bufsize=64) as queue:
+            self.owner = self._find_owner()
+            if self.owner is not None:
+                self._refresh()
+                self._on_change()
+
+            while True:
+                # the blocking connection is only ever used from this thread, so the periodic re-read happens here too
+                timeout = max(0.0, self._checked_at + self.refresh_seconds - time.monotonic())
+                try:
+                    message = connection.recv_until_filtered(queue, timeout=timeout)
+                except TimeoutError:
+                    if self.owner is None or self.status != "Playing":  # nothing is moving
+                        self._checked_at = time.monotonic()
+                    elif self._read_position():
+                        self._on_change()
+                    continue
+                except Exception as error:  # the bus went away
+                    print("Lost the MPRIS connection, polling the web API instead:", repr(error))
+                    self.owner = None
+                    self._on_change()
+                    return
+
+                self._handle(message)
+
+    def _handle(self, message):
+        fields = message.header.fields
+        member = fields.get(HeaderFields.member)
+
+        if member == "NameOwnerChanged":
+            name, _, new_owner = message.body
+            if name != self.player:
+                return
+
+            self.owner = new_owner or None  # empty when the player quit
+            if self.owner is not None:
+                self._refresh()
+        elif fields.get(HeaderFields.sender) != self.owner:  # another player on the same path
+            return
+        elif member == "PropertiesChanged":
+            interface, changed, _ = message.body
+            if interface != MPRIS_PLAYER or not {"Metadata", "PlaybackStatus"} & changed.keys():
+                return
+
+            self._refresh()
+        elif member == "Seeked":
+            with self._lock:
+                self.position_us = message.body[0]
+                self.anchor = self._checked_at = time.monotonic()
+        else:
+            return
+
+        self._on_change()
+
+    def current_playback(self) -> dict | None:
+        if self.owner is None:
+            raise PlaybackUnavailable(f"{self.player} isn't running")
+
+        with self._lock:
+            if self.status == "Stopped":  # the client is open but idle, something might be playing on another device
+                raise PlaybackUnavailable(f"{self.player} is stopped")
+
+            metadata = self.metadata
+            track_id = str(metadata.get("mpris:trackid", ""))
+            if "track" not in track_id:  # an ad
+                return None
+
+            playing = self.status == "Playing"
+            position_us = self.position_us + (int((time.monotonic() - self.anchor) * 1_000_000) if playing else 0)
+
+        duration_ms = int(metadata.get("mpris:length", 0)) // 1000
+        return {
+            "is_playing": playing,
+            "progress_ms": max(0, min(position_us // 1000, duration_ms)),
+            "item": {
+                # "spotify:track:<id>" from older clients, "/com/spotify/track/<id>" from newer ones
+                "id": track_id.replace(":", "/").rsplit("/", 1)[-1],
+                "name": metadata.get("xesam:title", ""),
+                "duration_ms": duration_ms,
+                "artists": [{"name": artist} for artist in metadata.get("xesam:artist", [])],
+                "album": {
+                    "name": metadata.get("xesam:album", ""),
+                    "images": [{"url": metadata.get("mpris:artUrl", "")}]
+                }
+            }
+        }
@@ -0,0 +1,28 @@
+# Wall clock times of the startup stages. With LYRICS_STARTUP_BENCHMARK=1 they're also printed for benchmarks/startup_benchmark.py
+from __future__ import annotations
+
+import os
+import time
+
+
+BENCHMARK = os.environ.get("LYRICS_STARTUP_BENCHMARK") == "1"
+
+marks: dict[str, float] = {}
+
+
+def mark(stage: str):
+    # only the first time a stage is reached counts
+    if stage in marks:
+        return
+
+    marks[stage] = time.time()
+    if BENCHMARK:
+        print(f"STARTUP {stage} {marks[stage]:.6f}", flush=True)
+
+
+def summary() -> str:
+    if "interpreter" not in marks:
+        return ""
+
+    start = marks["interpreter"]
+    return ", ".join(f"{stage} {round((at - start) * 1000)}ms" for stage, at in marks.items() if stage != "interpreter")